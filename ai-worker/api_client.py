@@ -0,0 +1,92 @@
+import threading
+import requests
+
+class ApiClient:
+    """
+    Authenticated access to the backend API for the worker.
+    Prefers a long-lived service token (WORKER_SERVICE_TOKEN, issued by an admin via
+    POST /auth/service-token) so the worker never triggers a bcrypt login. Otherwise it
+    logs in once with email/password and from then on trades its refresh token for new
+    access tokens; the password is only used again if the refresh token is rejected.
+    """
+    def __init__(self, base_url, email=None, password=None, service_token=None, timeout=10):
+        self.base_url = base_url.rstrip("/")
+        self.email = email
+        self.password = password
+        self.service_token = service_token
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.access_token = service_token
+        self.refresh_token = None
+        self._lock = threading.Lock()
+
+    def _store(self, response):
+        body = response.json()
+        self.access_token = body["access_token"]
+        self.refresh_token = body.get("refresh_token")
+
+    def login(self):
+        """Password login; returns True once an access token is held."""
+        try:
+            response = self.session.post(
+                f"{self.base_url}/auth/login",
+                data={"username": self.email, "password": self.password},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            print(f"Connection error to backend: {e}")
+            return False
+        if response.status_code != 200:
+            print(f"Login failed: {response.text}")
+            return False
+        self._store(response)
+        return True
+
+    def refresh(self):
+        """Renews the access token from the refresh token, falling back to a password login."""
+        if self.refresh_token:
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/auth/refresh",
+                    json={"refresh_token": self.refresh_token},
+                    timeout=self.timeout,
+                )
+                if response.status_code == 200:
+                    self._store(response)
+                    return True
+                print(f"Token refresh failed: {response.text}")
+            except requests.RequestException as e:
+                print(f"Connection error to backend: {e}")
+                return False
+        self.refresh_token = None
+        if self.email and self.password:
+            return self.login()
+        return False
+
+    def authenticate(self):
+        """Ensures a token is held: the service token, or a login."""
+        with self._lock:
+            if self.access_token:
+                return True
+            return self.login()
+
+    def request(self, method, path, **kwargs):
+        """Sends an authenticated request; on 401/403 renews the token once and retries."""
+        sent_with = self.access_token
+        response = self._send(method, path, **kwargs)
+        if response.status_code in (401, 403) and not self.service_token:
+            with self._lock:
+                # Another thread may already have renewed it
+                renewed = self.access_token != sent_with or self.refresh()
+            if renewed:
+                response = self._send(method, path, **kwargs)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def _send(self, method, path, **kwargs):
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers["Authorization"] = f"Bearer {self.access_token}"
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, f"{self.base_url}{path}", headers=headers, **kwargs)
@@ -5,6 +5,39 @@ class Config:
     # Processing settings
     PROCESS_FPS = 2  # Process 1 frame every 0.5 seconds
     CONFIDENCE_THRESHOLD = 0.5
+    # Batched inference: max frames per YOLO call, and how long to wait for a batch to fill
+    BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+    BATCH_MAX_WAIT_MS = int(os.getenv("BATCH_MAX_WAIT_MS", "50"))
+    # Spot occupancy criterion: center (spot center in vehicle box), iou, or overlap (share of spot covered)
+    OCCUPANCY_METHOD = os.getenv("OCCUPANCY_METHOD", "center")
+    OCCUPANCY_MIN_OVERLAP = float(os.getenv("OCCUPANCY_MIN_OVERLAP", "0.3"))
+    # Occupancy debounce: window (N-of-M frames), ema (decayed confidence with hysteresis), or none
+    SMOOTHING_MODE = os.getenv("SMOOTHING_MODE", "window")
+    SMOOTHING_WINDOW = int(os.getenv("SMOOTHING_WINDOW", "5"))
+    SMOOTHING_MIN_AGREE = int(os.getenv("SMOOTHING_MIN_AGREE", "3"))
+    SMOOTHING_EMA_ALPHA = float(os.getenv("SMOOTHING_EMA_ALPHA", "0.3"))
+    SMOOTHING_EMA_HIGH = float(os.getenv("SMOOTHING_EMA_HIGH", "0.7"))
+    SMOOTHING_EMA_LOW = float(os.getenv("SMOOTHING_EMA_LOW", "0.3"))
+    # Approximate retention of the spot event stream
+    SPOT_EVENTS_MAXLEN = int(os.getenv("SPOT_EVENTS_MAXLEN", "100000"))
+    # Re-send every spot's status this often to reconcile with Redis (e.g. expired reservations)
+    STATUS_RESYNC_SECONDS = int(os.getenv("STATUS_RESYNC_SECONDS", "30"))
+    # Camera/spot configuration: re-fetched this often, or right after the backend
+    # publishes on WORKER_CONFIG_CHANNEL (changes arriving within the debounce are fetched once)
+    CONFIG_POLL_SECONDS = float(os.getenv("CONFIG_POLL_SECONDS", "60"))
+    CONFIG_NOTIFY_DEBOUNCE_SECONDS = float(os.getenv("CONFIG_NOTIFY_DEBOUNCE_SECONDS", "1"))
+    WORKER_CONFIG_CHANNEL = os.getenv("WORKER_CONFIG_CHANNEL", "worker_config")
+    # Fetch without If-None-Match this often, in case a change was missed by the version counter
+    CONFIG_FULL_REFRESH_SECONDS = float(os.getenv("CONFIG_FULL_REFRESH_SECONDS", "600"))
+    # How long to wait for a removed camera's grab thread to exit
+    PIPELINE_STOP_TIMEOUT_SECONDS = float(os.getenv("PIPELINE_STOP_TIMEOUT_SECONDS", "2"))
+    # Sharding: WORKER_PROCESSES processes on this host, each with its own model, and with
+    # WORKER_SHARDING (implied by more than one process) cameras are split between every
+    # worker process sharing this Redis through leases renewed every LEASE_RENEW_SECONDS
+    WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+    SHARDING_ENABLED = os.getenv("WORKER_SHARDING", "false").lower() in ("1", "true", "yes") or WORKER_PROCESSES > 1
+    LEASE_TTL_SECONDS = float(os.getenv("LEASE_TTL_SECONDS", "15"))
+    LEASE_RENEW_SECONDS = float(os.getenv("LEASE_RENEW_SECONDS", "5"))
     
     # Model paths (auto-downloaded by libraries usually)
     YOLO_MODEL = "yolov8n.pt" # Nano model for speed
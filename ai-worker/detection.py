@@ -18,16 +18,25 @@ class Detector:
         Detects vehicles in the frame.
         Returns a list of bounding boxes [x1, y1, x2, y2].
         """
-        results = self.model(frame, verbose=False, conf=config.CONFIDENCE_THRESHOLD)
-        vehicles = []
+        return self.detect_vehicles_batch([frame])[0]
+
+    def detect_vehicles_batch(self, frames):
+        """
+        Detects vehicles in several frames with a single model call.
+        Returns one list of bounding boxes [x1, y1, x2, y2] per frame, in order.
+        """
+        results = self.model(frames, verbose=False, conf=config.CONFIDENCE_THRESHOLD)
+        batch = []
         for r in results:
+            vehicles = []
             boxes = r.boxes
             for box in boxes:
                 cls = int(box.cls[0])
                 if cls in self.vehicle_classes:
                     x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
                     vehicles.append((int(x1), int(y1), int(x2), int(y2)))
-        return vehicles
+            batch.append(vehicles)
+        return batch
 
     def read_license_plate(self, frame, vehicle_box):
         """
@@ -65,26 +74,61 @@ class Detector:
                 max_conf = conf
         return text if text else None
 
-    def check_occupancy(self, spots, vehicle_boxes):
+    def check_occupancy(self, spots, vehicle_boxes, method=None):
         """
-        Maps vehicle boxes to spots.
-        spots: List of dicts {'id': 1, 'coords': [x1, y1, x2, y2]}
-        Returns list of (spot_id, status, license_plate_text)
+        Maps vehicle boxes to spots, for all spots against all boxes at once.
+        spots: SpotGeometry, or List of dicts {'id': 1, 'coords': [x1, y1, x2, y2]}
+        method: 'center' (spot center inside a vehicle box), 'iou', or 'overlap'
+                (intersection / spot area); defaults to config.OCCUPANCY_METHOD.
+        Returns list of (spot_id, status)
         """
-        updates = []
-        # Simple IoU or Center-point logic
-        for spot in spots:
-            sx1, sy1, sx2, sy2 = spot['coords']
-            spot_center = ((sx1+sx2)//2, (sy1+sy2)//2)
-            
-            is_occupied = False
-            for box in vehicle_boxes:
-                vx1, vy1, vx2, vy2 = box
-                # Check if spot center is inside vehicle box
-                if vx1 < spot_center[0] < vx2 and vy1 < spot_center[1] < vy2:
-                    is_occupied = True
-                    break
-            
-            status = 'occupied' if is_occupied else 'free'
-            updates.append((spot['id'], status))
-        return updates
+        if not isinstance(spots, SpotGeometry):
+            spots = SpotGeometry(spots)
+        occupied = spots.occupied(vehicle_boxes, method or config.OCCUPANCY_METHOD)
+        return [(spot_id, 'occupied' if o else 'free') for spot_id, o in zip(spots.ids, occupied.tolist())]
+
+class SpotGeometry:
+    """
+    Spot rectangles of one camera as a preallocated (N, 4) array, built once per camera
+    so each tick only does array math against that tick's vehicle boxes.
+    """
+    def __init__(self, spots):
+        self.ids = [spot['id'] for spot in spots]
+        coords = np.array([spot['coords'] for spot in spots], dtype=np.int64).reshape(-1, 4)
+        self.boxes = coords.astype(np.float32)
+        # Integer centers, as the original center-point check used
+        self.centers = np.stack([(coords[:, 0] + coords[:, 2]) // 2, (coords[:, 1] + coords[:, 3]) // 2], axis=1).astype(np.float32)
+        self.areas = (self.boxes[:, 2] - self.boxes[:, 0]) * (self.boxes[:, 3] - self.boxes[:, 1])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def occupied(self, vehicle_boxes, method='center'):
+        """Boolean array, one entry per spot."""
+        vehicles = np.asarray(vehicle_boxes, dtype=np.float32).reshape(-1, 4)
+        if len(vehicles) == 0 or len(self.ids) == 0:
+            return np.zeros(len(self.ids), dtype=bool)
+
+        if method == 'center':
+            # (N, 1) spot centers against (M,) vehicle edges -> (N, M)
+            cx = self.centers[:, 0:1]
+            cy = self.centers[:, 1:2]
+            inside = (vehicles[:, 0] < cx) & (cx < vehicles[:, 2]) & (vehicles[:, 1] < cy) & (cy < vehicles[:, 3])
+            return inside.any(axis=1)
+
+        ix1 = np.maximum(self.boxes[:, 0:1], vehicles[:, 0])
+        iy1 = np.maximum(self.boxes[:, 1:2], vehicles[:, 1])
+        ix2 = np.minimum(self.boxes[:, 2:3], vehicles[:, 2])
+        iy2 = np.minimum(self.boxes[:, 3:4], vehicles[:, 3])
+        intersection = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+
+        if method == 'iou':
+            vehicle_areas = (vehicles[:, 2] - vehicles[:, 0]) * (vehicles[:, 3] - vehicles[:, 1])
+            denominator = self.areas[:, None] + vehicle_areas - intersection
+        elif method == 'overlap':
+            denominator = np.broadcast_to(self.areas[:, None], intersection.shape)
+        else:
+            raise ValueError(f"Unknown occupancy method: {method}")
+
+        scores = np.divide(intersection, denominator, out=np.zeros_like(intersection), where=denominator > 0)
+        return scores.max(axis=1) >= config.OCCUPANCY_MIN_OVERLAP
@@ -0,0 +1,60 @@
+import threading
+import time
+import cv2
+from config import config
+
+class FrameGrabber:
+    """
+    Drains an RTSP stream with grab() and only decodes (retrieve()) the newest frame
+    when the inference stage has asked for one and the camera's interval has elapsed.
+    The decoded frame lives in a single reusable buffer: the next retrieve() only happens
+    after request_frame() signals that the previous frame is no longer in use.
+    """
+    def __init__(self, camera_id, rtsp_url, on_frame):
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        self.on_frame = on_frame  # on_frame(camera_id, frame)
+        self.interval = 1.0 / config.PROCESS_FPS
+        self._wanted = threading.Event()
+        self._wanted.set()
+        self._running = True
+        self._buffer = None
+
+    def request_frame(self):
+        """Called by the inference side once it is done with the last frame."""
+        self._wanted.set()
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        """Grab loop; returns when stopped or if the stream cannot be opened."""
+        cap = cv2.VideoCapture(self.rtsp_url)
+        if not cap.isOpened():
+            print(f"Error: Could not open stream {self.rtsp_url}")
+            return
+
+        last_retrieve_time = 0
+        try:
+            while self._running:
+                # grab() blocks at the stream's frame rate and drops the frame without decoding
+                if not cap.grab():
+                    print(f"Stream ended for Camera {self.camera_id}. Retrying...")
+                    cap.release()
+                    time.sleep(5)
+                    cap = cv2.VideoCapture(self.rtsp_url)
+                    continue
+
+                current_time = time.time()
+                if not self._wanted.is_set() or current_time - last_retrieve_time < self.interval:
+                    continue
+
+                ok, frame = cap.retrieve(self._buffer)
+                if not ok:
+                    continue
+                self._buffer = frame
+                self._wanted.clear()
+                last_retrieve_time = current_time
+                self.on_frame(self.camera_id, frame)
+        finally:
+            cap.release()
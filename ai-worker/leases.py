@@ -0,0 +1,151 @@
+import math
+import os
+import socket
+import uuid
+import zlib
+from config import config
+
+# Registers/refreshes a worker in the membership sorted set (score = expiry, in Redis
+# server time so hosts need no clock sync), drops expired members and returns how many
+# workers are alive.
+# KEYS: [members]  ARGV: [worker_id, ttl_ms]
+HEARTBEAT_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[1])
+return redis.call('ZCARD', KEYS[1])
+"""
+
+# Extends the leases still held by this worker. Returns 1/0 per key, in order.
+# KEYS: lease keys  ARGV: [worker_id, ttl_ms]
+RENEW_LUA = """
+local renewed = {}
+for i, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('PEXPIRE', key, ARGV[2])
+        renewed[i] = 1
+    else
+        renewed[i] = 0
+    end
+end
+return renewed
+"""
+
+# Takes free leases, in key order, until `wanted` are held. Returns the claimed key indexes (1-based).
+# KEYS: candidate lease keys  ARGV: [worker_id, ttl_ms, wanted]
+CLAIM_LUA = """
+local claimed = {}
+local wanted = tonumber(ARGV[3])
+for i, key in ipairs(KEYS) do
+    if #claimed >= wanted then
+        break
+    end
+    if redis.call('SET', key, ARGV[1], 'NX', 'PX', ARGV[2]) then
+        claimed[#claimed + 1] = i
+    end
+end
+return claimed
+"""
+
+# Deletes the leases this worker still holds.
+# KEYS: lease keys  ARGV: [worker_id]
+RELEASE_LUA = """
+for _, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('DEL', key)
+    end
+end
+return 1
+"""
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+class CameraLeaseManager:
+    """
+    Splits cameras between worker processes (on any number of hosts) through Redis leases.
+    Every tick a worker heartbeats its membership, renews the leases it holds, and moves
+    towards its fair share, ceil(cameras / live workers): above it, it releases leases for
+    other workers to take; below it, it claims free ones. A worker that dies stops renewing,
+    so its leases and membership expire after LEASE_TTL_SECONDS and the survivors' larger
+    share makes them pick its cameras up. Each tick is a fixed number of round trips.
+    Membership is counted per group (the organization whose cameras the worker runs), so
+    workers of other organizations sharing this Redis do not shrink the share.
+    """
+    def __init__(self, redis_client, worker_id=None, ttl=None, prefix="ai_worker"):
+        self.redis_client = redis_client
+        self.worker_id = worker_id or default_worker_id()
+        self.ttl_ms = int((ttl or config.LEASE_TTL_SECONDS) * 1000)
+        self.prefix = prefix
+        self.members_key = None  # set by the first tick, from its group
+        self.lease_prefix = f"{prefix}:camera_lease:"
+        self._heartbeat = redis_client.register_script(HEARTBEAT_LUA)
+        self._renew = redis_client.register_script(RENEW_LUA)
+        self._claim = redis_client.register_script(CLAIM_LUA)
+        self._release = redis_client.register_script(RELEASE_LUA)
+        # Workers start scanning free cameras at different offsets, so they rarely race for the same lease
+        self._offset = zlib.crc32(self.worker_id.encode())
+        self.owned = set()
+
+    def lease_key(self, camera_id):
+        return f"{self.lease_prefix}{camera_id}"
+
+    def tick(self, camera_ids, group):
+        """
+        Rebalances against the configured camera ids, shared with the other workers of the
+        same group; returns the set this worker now owns.
+        """
+        camera_ids = sorted(set(camera_ids))
+        if not camera_ids:
+            # Nothing to share: hand everything back and stop counting towards anyone's share
+            self.leave()
+            return set()
+        members_key = f"{self.prefix}:members:{group}"
+        if members_key != self.members_key:
+            self._leave_group()
+            self.members_key = members_key
+        workers = max(1, int(self._heartbeat(keys=[self.members_key], args=[self.worker_id, self.ttl_ms])))
+        share = math.ceil(len(camera_ids) / workers)
+
+        # Cameras no longer configured are simply let go
+        gone = [c for c in self.owned if c not in camera_ids]
+        if gone:
+            self.release(gone)
+        held = sorted(self.owned)
+        if held:
+            renewed = self._renew(keys=[self.lease_key(c) for c in held], args=[self.worker_id, self.ttl_ms])
+            lost = [c for c, ok in zip(held, renewed) if not ok]
+            if lost:
+                print(f"Lost camera lease(s) {lost} to another worker")
+            self.owned = {c for c, ok in zip(held, renewed) if ok}
+
+        if len(self.owned) > share:
+            self.release(sorted(self.owned)[share:])
+        elif len(self.owned) < share:
+            free = [c for c in camera_ids if c not in self.owned]
+            if free:
+                start = self._offset % len(free)
+                candidates = free[start:] + free[:start]
+                claimed = self._claim(
+                    keys=[self.lease_key(c) for c in candidates],
+                    args=[self.worker_id, self.ttl_ms, share - len(self.owned)],
+                )
+                self.owned.update(candidates[i - 1] for i in claimed)
+        return set(self.owned)
+
+    def release(self, camera_ids):
+        camera_ids = list(camera_ids)
+        if camera_ids:
+            self._release(keys=[self.lease_key(c) for c in camera_ids], args=[self.worker_id])
+            self.owned.difference_update(camera_ids)
+
+    def leave(self):
+        """Graceful shutdown: hands every camera back at once instead of after the lease TTL."""
+        self.release(self.owned)
+        self._leave_group()
+
+    def _leave_group(self):
+        if self.members_key is not None:
+            self.redis_client.zrem(self.members_key, self.worker_id)
+            self.members_key = None
@@ -0,0 +1,83 @@
+import time
+from config import config
+
+# Applies a batch of detected statuses for one camera's zone in a single atomic round trip:
+# sets spot:{id}:status, keeps the per-zone/per-org free-spot sets (read by the backend's
+# /navigation/assign) and the spot_zone hash in sync, and appends ONE entry listing every
+# real transition to the durable spot event stream (consumed by the backend through
+# consumer groups). A spot reserved by the backend stays 'reserved' until a car
+# arrives or the reservation expires.
+# KEYS: [zone_set, org_set, spot_zone_hash, stream]  ARGV: [zone_id, organization_id, stream_maxlen, id1, status1, ...]
+# Returns the applied status of every spot, in argument order.
+APPLY_STATUSES_LUA = """
+local applied = {}
+local changes = {}
+for i = 4, #ARGV, 2 do
+    local spot_id = ARGV[i]
+    local status = ARGV[i + 1]
+    local status_key = 'spot:' .. spot_id .. ':status'
+    local reserved_key = 'spot:' .. spot_id .. ':reserved'
+    if status == 'free' and redis.call('EXISTS', reserved_key) == 1 then
+        status = 'reserved'
+    end
+    redis.call('HSET', KEYS[3], spot_id, ARGV[1])
+    if status == 'free' then
+        redis.call('SADD', KEYS[1], spot_id)
+        redis.call('SADD', KEYS[2], spot_id)
+    else
+        redis.call('SREM', KEYS[1], spot_id)
+        redis.call('SREM', KEYS[2], spot_id)
+    end
+    if redis.call('GET', status_key) ~= status then
+        redis.call('SET', status_key, status)
+        if status == 'occupied' then
+            redis.call('DEL', reserved_key)
+        end
+        changes[#changes + 1] = {spot_id = tonumber(spot_id), status = status}
+    end
+    applied[#applied + 1] = status
+end
+if #changes > 0 then
+    redis.call('XADD', KEYS[4], 'MAXLEN', '~', ARGV[3], '*', 'data', cjson.encode({
+        zone_id = tonumber(ARGV[1]),
+        organization_id = tonumber(ARGV[2]),
+        updates = changes
+    }))
+end
+return applied
+"""
+
+class StatusPublisher:
+    """
+    Keeps the last-known status of one camera's spots and flushes only the spots that
+    changed since the previous tick, as one Redis script call (O(1) round trips per tick).
+    Every STATUS_RESYNC_SECONDS the whole camera is re-sent, so changes made in Redis
+    behind the worker's back (e.g. an expired reservation) are reconciled.
+    """
+    def __init__(self, redis_client, zone_id, organization_id, stream="spot_events"):
+        self.zone_id = zone_id
+        self.organization_id = organization_id
+        self.keys = [f"zone:{zone_id}:free_spots", f"org:{organization_id}:free_spots", "spot_zone", stream]
+        self._apply = redis_client.register_script(APPLY_STATUSES_LUA)
+        self._last_status = {}
+        self._last_resync = 0
+
+    def publish(self, updates):
+        """updates: list of (spot_id, status) for this tick. Returns the number of spots flushed."""
+        current_time = time.time()
+        if current_time - self._last_resync > config.STATUS_RESYNC_SECONDS:
+            self._last_status.clear()
+            self._last_resync = current_time
+
+        changed = [(spot_id, status) for spot_id, status in updates if self._last_status.get(spot_id) != status]
+        if not changed:
+            return 0
+
+        args = [self.zone_id, self.organization_id, config.SPOT_EVENTS_MAXLEN]
+        for spot_id, status in changed:
+            args.extend((spot_id, status))
+        applied = self._apply(keys=self.keys, args=args)
+        for (spot_id, _), status in zip(changed, applied):
+            # Store what Redis holds: a spot kept 'reserved' is re-sent until that resolves
+            self._last_status[spot_id] = status
+        return len(changed)
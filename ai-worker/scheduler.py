@@ -0,0 +1,91 @@
+import threading
+import time
+from config import config
+
+class InferenceScheduler:
+    """
+    Runs one YOLO call per batch of camera frames instead of one call per frame per thread.
+    Cameras offer their latest frame; the scheduler thread waits for the first ready camera,
+    then up to BATCH_MAX_WAIT_MS for more (at most BATCH_MAX_SIZE), runs a single batched
+    detection and fans the vehicle boxes back out to each camera's callback.
+    """
+    def __init__(self, detector, max_batch_size=None, max_wait=None):
+        self.detector = detector
+        self.max_batch_size = max_batch_size or config.BATCH_MAX_SIZE
+        self.max_wait = max_wait if max_wait is not None else config.BATCH_MAX_WAIT_MS / 1000.0
+        self._callbacks = {}  # camera_id -> (on_detections(vehicles), on_consumed())
+        self._pending = {}  # camera_id -> latest frame not yet inferred, in arrival order
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def register(self, camera_id, on_detections, on_consumed=None):
+        """
+        on_detections(vehicles) receives each result; on_consumed() is then called (even if
+        inference failed) so the frame source knows it may hand over its next frame.
+        """
+        with self._cond:
+            self._callbacks[camera_id] = (on_detections, on_consumed)
+
+    def unregister(self, camera_id, on_detections=None):
+        """With on_detections, only removes that registration (not a newer one for the camera)."""
+        with self._cond:
+            if on_detections is not None and self._callbacks.get(camera_id, (None,))[0] != on_detections:
+                return
+            self._callbacks.pop(camera_id, None)
+            self._pending.pop(camera_id, None)
+
+    def offer(self, camera_id, frame):
+        """Queues a camera's frame for the next batch; a newer frame replaces an older pending one."""
+        with self._cond:
+            if camera_id not in self._callbacks:
+                return
+            self._pending[camera_id] = frame
+            self._cond.notify()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            for camera_id in list(self._pending)[:self.max_batch_size]:
+                frame = self._pending.pop(camera_id)
+                batch.append((camera_id, frame, self._callbacks[camera_id]))
+            return batch
+
+    def run(self):
+        while not self._stopped:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                results = self.detector.detect_vehicles_batch([frame for _, frame, _ in batch])
+            except Exception as e:
+                print(f"Batch inference failed for cameras {[c for c, _, _ in batch]}: {e}")
+                results = [None] * len(batch)
+
+            for (camera_id, _, (on_detections, on_consumed)), vehicles in zip(batch, results):
+                try:
+                    if vehicles is not None:
+                        on_detections(vehicles)
+                except Exception as e:
+                    print(f"Error handling detections for Camera {camera_id}: {e}")
+                finally:
+                    if on_consumed:
+                        on_consumed()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
@@ -0,0 +1,55 @@
+import numpy as np
+from config import config
+
+class OccupancySmoother:
+    """
+    Per-spot hysteresis so a single missed or spurious detection does not flip a spot.
+    Modes (config.SMOOTHING_MODE):
+      'window': a spot changes state only once SMOOTHING_MIN_AGREE of the last
+                SMOOTHING_WINDOW observations disagree with its current state (N-of-M).
+      'ema':    an exponentially decayed occupancy confidence must cross
+                SMOOTHING_EMA_HIGH to become occupied and drop below SMOOTHING_EMA_LOW to become free.
+      'none':   raw detections pass through.
+    The first observation of a spot is taken as-is.
+    """
+    def __init__(self, num_spots, mode=None):
+        self.mode = mode or config.SMOOTHING_MODE
+        self.window = config.SMOOTHING_WINDOW
+        self.min_agree = min(config.SMOOTHING_MIN_AGREE, self.window)
+        self.alpha = config.SMOOTHING_EMA_ALPHA
+        self.state = np.zeros(num_spots, dtype=bool)
+        self._history = np.zeros((self.window, num_spots), dtype=bool)
+        self._cursor = 0
+        self._confidence = np.zeros(num_spots, dtype=np.float32)
+        self._initialized = False
+
+    def update(self, observed):
+        """observed: boolean occupancy array for this tick. Returns the stable state array."""
+        observed = np.asarray(observed, dtype=bool)
+        if not self._initialized or self.mode == 'none':
+            self.state[:] = observed
+            self._history[:] = observed
+            self._confidence[:] = observed
+            self._initialized = True
+            return self.state
+
+        if self.mode == 'window':
+            self._history[self._cursor] = observed
+            self._cursor = (self._cursor + 1) % self.window
+            flipped = (self._history != self.state).sum(axis=0) >= self.min_agree
+            self.state ^= flipped
+            # Restart the window for flipped spots so they need N fresh votes to flip back
+            self._history[:, flipped] = self.state[flipped]
+        elif self.mode == 'ema':
+            self._confidence += self.alpha * (observed - self._confidence)
+            self.state[self._confidence >= config.SMOOTHING_EMA_HIGH] = True
+            self.state[self._confidence <= config.SMOOTHING_EMA_LOW] = False
+        else:
+            raise ValueError(f"Unknown smoothing mode: {self.mode}")
+        return self.state
+
+    def smooth(self, updates):
+        """Same as update() for check_occupancy's (spot_id, status) tuples."""
+        observed = np.fromiter((status == 'occupied' for _, status in updates), dtype=bool, count=len(updates))
+        state = self.update(observed)
+        return [(spot_id, 'occupied' if o else 'free') for (spot_id, _), o in zip(updates, state.tolist())]
@@ -0,0 +1,234 @@
+import threading
+import time
+from detection import SpotGeometry
+from grabber import FrameGrabber
+from publisher import StatusPublisher
+from smoothing import OccupancySmoother
+from config import config
+
+class CameraPipeline:
+    """
+    One camera's processing: a FrameGrabber thread feeding the shared inference scheduler,
+    plus the camera's spot geometry, debounce state and status publisher. update() swaps
+    the spot/zone configuration in place, without reopening the stream.
+    """
+    def __init__(self, stream, detector, scheduler, redis_client):
+        self.camera_id = stream['id']
+        self.stream = stream
+        self.detector = detector
+        self.scheduler = scheduler
+        self.redis_client = redis_client
+        self._state = self._build_state(stream)
+        self.grabber = FrameGrabber(self.camera_id, stream['rtsp_url'], on_frame=scheduler.offer)
+        self._thread = None
+
+    def _build_state(self, stream):
+        geometry = SpotGeometry(stream['spots'])
+        return (
+            geometry,
+            OccupancySmoother(len(geometry)),
+            StatusPublisher(self.redis_client, stream['zone_id'], stream['organization_id']),
+        )
+
+    def _on_detections(self, vehicles):
+        """
+        Applies one inference result: occupancy check, debounce and Redis updates.
+        Called by the inference scheduler once per camera per batch.
+        """
+        # A single read, so a concurrent update() never mixes old and new state
+        geometry, smoother, publisher = self._state
+        # Check Occupancy, then only keep transitions that are stable across frames
+        updates = smoother.smooth(self.detector.check_occupancy(geometry, vehicles))
+
+        # Update Redis: only spots that differ from the last-known status, in one round trip
+        flushed = publisher.publish(updates)
+        if flushed:
+            print(f"Camera {self.camera_id}: flushed {flushed} spot status change(s)")
+
+    def _run(self):
+        try:
+            self.grabber.run()
+        finally:
+            self.scheduler.unregister(self.camera_id, self._on_detections)
+
+    def start(self):
+        print(f"Starting pipeline for Camera {self.camera_id} at {self.stream['rtsp_url']} with {len(self.stream['spots'])} spots")
+        self.scheduler.register(self.camera_id, self._on_detections, on_consumed=self.grabber.request_frame)
+        self._thread = threading.Thread(target=self._run, name=f"camera-{self.camera_id}", daemon=True)
+        self._thread.start()
+
+    def update(self, stream):
+        """New spots/zone for the same stream URL; debounce state restarts for the new spot list."""
+        print(f"Updating pipeline for Camera {self.camera_id}: {len(stream['spots'])} spots")
+        self._state = self._build_state(stream)
+        self.stream = stream
+
+    def signal_stop(self):
+        """Stops feeding detections right away; the grab thread exits at its next frame."""
+        print(f"Stopping pipeline for Camera {self.camera_id}")
+        self.grabber.stop()
+        self.scheduler.unregister(self.camera_id, self._on_detections)
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self, timeout=None):
+        self.signal_stop()
+        self.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+class PipelineSupervisor:
+    """
+    Keeps one CameraPipeline per configured camera while the process (and its loaded
+    models) stays up. Every CONFIG_POLL_SECONDS, or soon after the backend publishes on
+    the worker config channel, it re-fetches the configuration and diffs it against the
+    running pipelines: new cameras are started, removed ones stopped, changed spots or
+    zones applied in place, and a changed stream URL (or a dead pipeline) restarted.
+    With a CameraLeaseManager (sharding), only the cameras this worker holds leases for
+    are run. Leases are renewed/rebalanced every LEASE_RENEW_SECONDS on their own thread,
+    so a slow config fetch or a stream that is slow to close never delays renewal.
+    """
+    def __init__(self, fetch_streams, detector, scheduler, redis_client, leases=None):
+        self.fetch_streams = fetch_streams  # () -> list of stream dicts, or None on failure
+        self.detector = detector
+        self.scheduler = scheduler
+        self.redis_client = redis_client
+        self.leases = leases
+        self.pipelines = {}  # camera_id -> CameraPipeline
+        self._streams = None  # last fetched configuration
+        # Serializes lease ticks and pipeline changes between the fetch loop and the lease thread
+        self._lock = threading.RLock()
+        self._stopping = []  # pipelines signalled to stop whose threads have not been joined yet
+        self._wake = threading.Event()
+        self._stopped = False
+        self._stopped_event = threading.Event()
+
+    def sync(self, streams):
+        """
+        Reconciles running pipelines with streams; returns (started, updated, stopped) counts.
+        Never blocks on a stream: pipelines are only signalled to stop, join_stopped() waits for them.
+        """
+        desired = {stream['id']: stream for stream in streams}
+        started = updated = stopped = 0
+
+        with self._lock:
+            for camera_id in [c for c in self.pipelines if c not in desired]:
+                self._signal_stop(self.pipelines.pop(camera_id))
+                stopped += 1
+
+            for camera_id, stream in desired.items():
+                pipeline = self.pipelines.get(camera_id)
+                if pipeline is not None and pipeline.is_alive() and pipeline.stream['rtsp_url'] == stream['rtsp_url']:
+                    if pipeline.stream != stream:
+                        pipeline.update(stream)
+                        updated += 1
+                    continue
+                if pipeline is not None:
+                    self._signal_stop(pipeline)
+                pipeline = CameraPipeline(stream, self.detector, self.scheduler, self.redis_client)
+                pipeline.start()
+                self.pipelines[camera_id] = pipeline
+                started += 1
+        return started, updated, stopped
+
+    def _signal_stop(self, pipeline):
+        pipeline.signal_stop()
+        self._stopping.append(pipeline)
+
+    def join_stopped(self):
+        """Waits for the signalled pipelines' threads, all at once (PIPELINE_STOP_TIMEOUT_SECONDS overall)."""
+        with self._lock:
+            stopping, self._stopping = self._stopping, []
+        deadline = time.monotonic() + config.PIPELINE_STOP_TIMEOUT_SECONDS
+        for pipeline in stopping:
+            pipeline.join(max(0, deadline - time.monotonic()))
+        stuck = [pipeline.camera_id for pipeline in stopping if pipeline.is_alive()]
+        if stuck:
+            print(f"Pipeline(s) for Camera(s) {stuck} still closing their stream; left to exit on their own")
+
+    def notify(self):
+        """Triggers a re-sync now instead of at the next poll."""
+        self._wake.set()
+
+    def _listen(self):
+        """Wakes the supervisor on every config change notification; reconnects on errors."""
+        while not self._stopped:
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(config.WORKER_CONFIG_CHANNEL)
+                for _ in pubsub.listen():
+                    self.notify()
+            except Exception as e:
+                print(f"Config notification listener error: {e}")
+                time.sleep(5)
+
+    def _apply(self, streams):
+        if self.leases is not None:
+            # Held across tick and sync, so the other thread never runs pipelines for stale leases
+            with self._lock:
+                if self._stopped:
+                    return
+                try:
+                    # Workers compete for the cameras of the organization they fetch the config as
+                    group = streams[0]['organization_id'] if streams else None
+                    owned = self.leases.tick([stream['id'] for stream in streams], group)
+                except Exception as e:
+                    # Other workers rely on the same Redis, so they cannot take over meanwhile
+                    print(f"Camera lease update failed; keeping current pipelines: {e}")
+                    return
+                started, updated, stopped = self.sync([stream for stream in streams if stream['id'] in owned])
+        else:
+            started, updated, stopped = self.sync(streams)
+        if started or updated or stopped:
+            print(f"Configuration synced: {started} started, {updated} updated, {stopped} stopped, {len(self.pipelines)} running")
+
+    def _renew_leases(self):
+        """Lease thread: renews/rebalances against the last fetched configuration."""
+        while not self._stopped_event.wait(config.LEASE_RENEW_SECONDS):
+            if self._streams is not None:
+                self._apply(self._streams)
+
+    def run(self):
+        threading.Thread(target=self._listen, name="config-listener", daemon=True).start()
+        if self.leases is not None:
+            threading.Thread(target=self._renew_leases, name="lease-renewal", daemon=True).start()
+        next_fetch = 0
+        while not self._stopped:
+            if self._wake.is_set() or time.monotonic() >= next_fetch:
+                # Cleared before fetching, so a change published mid-fetch triggers another pass
+                self._wake.clear()
+                fetched = self.fetch_streams()
+                if fetched is None:
+                    print("Could not fetch configuration; keeping current pipelines")
+                else:
+                    self._streams = fetched
+                next_fetch = time.monotonic() + config.CONFIG_POLL_SECONDS
+            if self._streams is not None:
+                self._apply(self._streams)
+            self.join_stopped()
+
+            timeout = max(0, next_fetch - time.monotonic())
+            if self.leases is not None:
+                # Also reaps pipelines the lease thread stopped
+                timeout = min(timeout, config.LEASE_RENEW_SECONDS)
+            if self._wake.wait(timeout):
+                # Coalesce bursts of changes (e.g. a zone's spots being drawn) into one fetch
+                time.sleep(config.CONFIG_NOTIFY_DEBOUNCE_SECONDS)
+
+    def stop(self):
+        self._stopped_event.set()
+        self._wake.set()
+        with self._lock:
+            self._stopped = True
+            for pipeline in self.pipelines.values():
+                self._signal_stop(pipeline)
+            self.pipelines.clear()
+            if self.leases is not None:
+                try:
+                    self.leases.leave()
+                except Exception as e:
+                    print(f"Could not release camera leases: {e}")
+        self.join_stopped()
@@ -1,159 +1,149 @@
 import time
-import cv2
 import redis
-import json
-import threading
-import requests
 import os
+import signal
+import sys
+import multiprocessing
 from detection import Detector
+from scheduler import InferenceScheduler
+from supervisor import PipelineSupervisor
+from leases import CameraLeaseManager
+from api_client import ApiClient
 from config import config
 
 # Configuration
 API_URL = os.getenv("API_URL", "http://backend:8000/api/v1")
 WORKER_EMAIL = os.getenv("WORKER_EMAIL", "admin@example.com")
 WORKER_PASSWORD = os.getenv("WORKER_PASSWORD", "password")
+# Long-lived token from POST /auth/service-token; when set, no password login happens
+WORKER_SERVICE_TOKEN = os.getenv("WORKER_SERVICE_TOKEN")
 
 # Connect to Redis
 r = redis.Redis.from_url(config.REDIS_URL, decode_responses=True)
 
-detector = Detector()
+api = ApiClient(API_URL, WORKER_EMAIL, WORKER_PASSWORD, WORKER_SERVICE_TOKEN)
 
-def get_auth_token():
+# Last fetched configuration and its ETag, so an unchanged poll costs one 304
+_config_cache = {"etag": None, "streams": None, "fetched_at": 0}
+
+def fetch_cameras_and_spots():
+    """
+    Cameras with a zone and their spots, from the paginated /cameras/worker-config;
+    None if the configuration could not be fetched. Sends If-None-Match with the last
+    ETag (except every CONFIG_FULL_REFRESH_SECONDS) and reuses the cached streams on 304.
+    """
+    full_refresh = time.time() - _config_cache["fetched_at"] > config.CONFIG_FULL_REFRESH_SECONDS
     try:
-        response = requests.post(
-            f"{API_URL}/auth/login",
-            data={"username": WORKER_EMAIL, "password": WORKER_PASSWORD}
-        )
-        if response.status_code == 200:
-            return response.json()["access_token"]
-        print(f"Login failed: {response.text}")
+        # A page from a newer version than the first means the config changed mid-fetch: start over
+        for _ in range(3):
+            etag = None
+            cameras = []
+            after = 0
+            while True:
+                headers = {}
+                if after == 0 and _config_cache["etag"] and not full_refresh:
+                    headers["If-None-Match"] = _config_cache["etag"]
+                response = api.get("/cameras/worker-config", params={"after": after}, headers=headers)
+                if response.status_code == 304:
+                    return _config_cache["streams"]
+                if response.status_code != 200:
+                    print(f"Failed to fetch cameras: {response.text}")
+                    return None
+                page_etag = response.headers.get("ETag")
+                if after == 0:
+                    etag = page_etag
+                elif page_etag != etag:
+                    break
+                page = response.json()
+                cameras.extend(page["cameras"])
+                if page["next_after"] is None:
+                    streams = [
+                        {
+                            'id': cam['id'],
+                            'rtsp_url': cam['rtsp_url'],
+                            'zone_id': cam['zone_id'],
+                            'organization_id': cam['organization_id'],
+                            # Format spots for detector: id, coords [x1, y1, x2, y2]
+                            'spots': [{'id': s[0], 'coords': s[1:5]} for s in cam['spots']],
+                        }
+                        # In our model, Camera -> Zone -> Spots; cameras without a zone have no spots
+                        for cam in cameras if cam.get("zone_id")
+                    ]
+                    _config_cache.update(etag=etag, streams=streams, fetched_at=time.time())
+                    return streams
+                after = page["next_after"]
+        print("Configuration kept changing while being fetched")
         return None
+
     except Exception as e:
-        print(f"Connection error to backend: {e}")
+        print(f"Error fetching config: {e}")
         return None
 
-def fetch_cameras_and_spots(token):
-    headers = {"Authorization": f"Bearer {token}"}
-    try:
-        # Fetch all cameras
-        response = requests.get(f"{API_URL}/cameras/", headers=headers)
-        if response.status_code != 200:
-            print(f"Failed to fetch cameras: {response.text}")
-            return []
-        
-        cameras = response.json()
-        active_streams = []
+def run_worker():
+    """One worker process: its own models and inference loop, running its cameras until stopped."""
+    detector = Detector()
+    # Single inference loop shared by all of this process's cameras (one YOLO call per batch of frames)
+    scheduler = InferenceScheduler(detector)
+    leases = CameraLeaseManager(r) if config.SHARDING_ENABLED else None
+    supervisor = PipelineSupervisor(fetch_cameras_and_spots, detector, scheduler, r, leases)
 
-        for cam in cameras:
-            # We need spots for this camera. 
-            # In our model, Camera -> Zone -> Spots.
-            if not cam.get("zone_id"):
-                continue
-            
-            # Fetch Zone details to get spots
-            z_resp = requests.get(f"{API_URL}/zones/{cam['zone_id']}", headers=headers)
-            if z_resp.status_code == 200:
-                zone_data = z_resp.json()
-                spots = zone_data.get("spots", [])
-                
-                # Format spots for detector: id, coords [x1, y1, x2, y2]
-                formatted_spots = []
-                for s in spots:
-                    formatted_spots.append({
-                        'id': s['id'],
-                        'coords': [s['x1'], s['y1'], s['x2'], s['y2']]
-                    })
-                
-                active_streams.append({
-                    'id': cam['id'],
-                    'rtsp_url': cam['rtsp_url'],
-                    'spots': formatted_spots
-                })
-        
-        return active_streams
+    print("AI Worker Started. Waiting for backend...")
+    
+    # Wait for backend to be ready
+    while not api.authenticate():
+        print("Waiting for backend/auth...")
+        time.sleep(5)
+    
+    print("Authenticated. Fetching configuration...")
+    if leases is not None:
+        print(f"Sharding enabled: claiming cameras as {leases.worker_id}")
+    scheduler.start()
 
-    except Exception as e:
-        print(f"Error fetching config: {e}")
-        return []
+    # On SIGTERM, hand the camera leases back instead of letting them expire
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        # Runs until the process exits: polls the camera/spot configuration (and listens for
+        # change notifications) and starts/stops/updates camera pipelines around the warm models
+        supervisor.run()
+    finally:
+        supervisor.stop()
+        scheduler.stop()
 
-def process_camera(camera_id, rtsp_url, spots):
+def run_processes(count):
     """
-    Process a single camera stream.
-    spots: List of spot dicts for this camera.
+    Runs count worker processes (each loading its own model, so inference uses count cores)
+    and restarts any that dies; its cameras move to the others once its leases expire.
     """
-    print(f"Starting worker for Camera {camera_id} at {rtsp_url} with {len(spots)} spots")
-    cap = cv2.VideoCapture(rtsp_url)
-    
-    if not cap.isOpened():
-        print(f"Error: Could not open stream {rtsp_url}")
-        return
+    # Fresh interpreters: forking after torch/OpenCV have started threads is unsafe
+    context = multiprocessing.get_context("spawn")
+    processes = {}
 
-    last_process_time = 0
-    interval = 1.0 / config.PROCESS_FPS # e.g. 0.5s
+    def stop_all(*_):
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join(config.LEASE_TTL_SECONDS)
+        sys.exit(0)
 
+    signal.signal(signal.SIGTERM, stop_all)
+    signal.signal(signal.SIGINT, stop_all)
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            print(f"Stream ended for Camera {camera_id}. Retrying...")
-            cap.release()
-            time.sleep(5)
-            cap = cv2.VideoCapture(rtsp_url)
-            continue
-
-        current_time = time.time()
-        if current_time - last_process_time > interval:
-            # Run Detection
-            vehicles = detector.detect_vehicles(frame)
-            
-            # Check Occupancy
-            updates = detector.check_occupancy(spots, vehicles)
-            
-            # Update Redis
-            for spot_id, status in updates:
-                # Key: spot:{id}:status
-                # We can also store history/log if status changed
-                old_status = r.get(f"spot:{spot_id}:status")
-                if old_status != status:
-                    print(f"Spot {spot_id} changed to {status}")
-                    r.set(f"spot:{spot_id}:status", status)
-                    # Publish event
-                    r.publish("spot_updates", json.dumps({"spot_id": spot_id, "status": status}))
-            
-            last_process_time = current_time
-        
-        # Sleep slightly to save CPU
-        time.sleep(0.01)
+        for index in range(count):
+            process = processes.get(index)
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                print(f"Worker process {index} exited with code {process.exitcode}; restarting")
+            process = context.Process(target=run_worker, name=f"ai-worker-{index}")
+            process.start()
+            processes[index] = process
+        time.sleep(5)
 
 def main():
-    print("AI Worker Started. Waiting for backend...")
-    
-    # Wait for backend to be ready
-    token = None
-    while not token:
-        token = get_auth_token()
-        if not token:
-            print("Waiting for backend/auth...")
-            time.sleep(5)
-    
-    print("Authenticated. Fetching configuration...")
-    
-    streams = fetch_cameras_and_spots(token)
-    
-    if not streams:
-        print("No active cameras found with zones/spots. Sleeping...")
-        # In a real app, we might poll periodically.
-        while True:
-            time.sleep(60)
-            
-    # Start threads
-    threads = []
-    for stream in streams:
-        t = threading.Thread(target=process_camera, args=(stream['id'], stream['rtsp_url'], stream['spots']))
-        t.start()
-        threads.append(t)
-    
-    for t in threads:
-        t.join()
+    if config.WORKER_PROCESSES > 1:
+        run_processes(config.WORKER_PROCESSES)
+    else:
+        run_worker()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,81 @@
+from array import array
+from collections import deque
+from typing import List, Optional, Tuple
+from app.algorithms.pathfinding import NEIGHBOURS, WALKABLE, ENTRANCE
+
+class DistanceField:
+    """
+    BFS distance and parent arrays from every entrance of a zone grid.
+    Built once per grid layout; answering "how far is spot X from entrance E"
+    and backtracking its path are then array lookups, with no search at request time.
+    """
+    def __init__(self, rows: int, cols: int, entrances: List[Tuple[int, int]], distances: List[array], parents: List[array]):
+        self.rows = rows
+        self.cols = cols
+        self.entrances = entrances
+        self._distances = distances
+        self._parents = parents
+
+    def distance(self, entrance: int, row: int, col: int) -> Optional[int]:
+        """Shortest path length from the entrance to the cell, or None if unreachable."""
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        d = self._distances[entrance][row * self.cols + col]
+        return d if d != -1 else None
+
+    def path(self, entrance: int, row: int, col: int) -> Optional[List[Tuple[int, int]]]:
+        """Backtracks the shortest path from the entrance to the cell (same shape as astar)."""
+        if self.distance(entrance, row, col) is None:
+            return None
+        parent = self._parents[entrance]
+        path = []
+        i = row * self.cols + col
+        while i != -1:
+            path.append(divmod(i, self.cols))
+            i = parent[i]
+        return path[::-1]
+
+def bfs_field(cells, rows: int, cols: int, start: Tuple[int, int]) -> Tuple[array, array]:
+    """
+    Unit-cost BFS from start. Walkable cells are expanded; any other cell (e.g. a spot)
+    gets a distance but is not driven through, matching astar's goal rule.
+    """
+    size = rows * cols
+    distance = array('i', [-1]) * size
+    parent = array('i', [-1]) * size
+    start_i = start[0] * cols + start[1]
+    distance[start_i] = 0
+    queue = deque([start_i])
+    while queue:
+        i = queue.popleft()
+        r, c = divmod(i, cols)
+        next_d = distance[i] + 1
+        for dr, dc in NEIGHBOURS:
+            nr = r + dr
+            nc = c + dc
+            if nr < 0 or nr >= rows or nc < 0 or nc >= cols:
+                continue
+            j = nr * cols + nc
+            if distance[j] != -1:
+                continue
+            distance[j] = next_d
+            parent[j] = i
+            if WALKABLE[cells[j]]:
+                queue.append(j)
+    return distance, parent
+
+def build_distance_field(cells, rows: int, cols: int) -> DistanceField:
+    """
+    Computes a BFS field from every entrance cell (value 4), in row-major order.
+    Grids without entrance cells use (0, 0), the default route start.
+    """
+    entrances = [divmod(i, cols) for i, value in enumerate(cells) if value == ENTRANCE]
+    if not entrances and rows and cols:
+        entrances = [(0, 0)]
+    distances = []
+    parents = []
+    for entrance in entrances:
+        distance, parent = bfs_field(cells, rows, cols, entrance)
+        distances.append(distance)
+        parents.append(parent)
+    return DistanceField(rows, cols, entrances, distances, parents)
@@ -0,0 +1,89 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional
+from app.algorithms.pathfinding import flatten_grid
+from app.algorithms.distance_field import DistanceField, build_distance_field
+from app.core.config import settings
+
+class CachedGrid(NamedTuple):
+    version: int
+    cells: bytearray
+    rows: int
+    cols: int
+
+def parse_grid(map_grid_data: str, version: int) -> CachedGrid:
+    """
+    Parses the JSON list-of-lists grid into the compact flat form used by astar_flat.
+    Raises ValueError/TypeError on malformed grid data.
+    """
+    grid = json.loads(map_grid_data)
+    if not isinstance(grid, list) or not all(isinstance(row, list) for row in grid):
+        raise ValueError("Grid must be a list of rows")
+    cells, rows, cols = flatten_grid(grid)
+    return CachedGrid(version, cells, rows, cols)
+
+class GridCache:
+    """
+    In-process LRU cache of parsed zone grids, keyed by zone id + Zone.grid_version.
+    Every layout change bumps the version in the database, so callers only fetch the
+    small version column per request and load map_grid_data on a miss (put()); stale
+    entries are never served, on any replica. invalidate() drops an entry eagerly.
+    Entrance distance fields are derived per entry and evicted along with it.
+    """
+    def __init__(self, max_zones: int):
+        self.max_zones = max_zones
+        self._entries: "OrderedDict[int, CachedGrid]" = OrderedDict()
+        self._fields: Dict[int, DistanceField] = {}
+        self._lock = threading.Lock()
+
+    def get(self, zone_id: int, version: int) -> Optional[CachedGrid]:
+        """The parsed grid if it is cached at this version, else None."""
+        with self._lock:
+            entry = self._entries.get(zone_id)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(zone_id)
+            return entry
+
+    def put(self, zone_id: int, version: int, map_grid_data: str) -> CachedGrid:
+        """Parses and caches a zone's grid as loaded at version."""
+        entry = parse_grid(map_grid_data, version)
+        with self._lock:
+            current = self._entries.get(zone_id)
+            # A concurrent request may already have cached a newer layout
+            if current is not None and current.version > version:
+                return entry
+            self._entries[zone_id] = entry
+            self._entries.move_to_end(zone_id)
+            self._fields.pop(zone_id, None)
+            while len(self._entries) > self.max_zones:
+                evicted_id, _ = self._entries.popitem(last=False)
+                self._fields.pop(evicted_id, None)
+        return entry
+
+    def distance_field(self, zone_id: int, grid: CachedGrid) -> DistanceField:
+        """Entrance BFS fields for a grid returned by get(); computed once per layout."""
+        with self._lock:
+            field = self._fields.get(zone_id)
+            if field is not None and self._entries.get(zone_id) is grid:
+                return field
+
+        field = build_distance_field(grid.cells, grid.rows, grid.cols)
+        with self._lock:
+            # Only memoize if the grid is still the current layout for the zone
+            if self._entries.get(zone_id) is grid:
+                self._fields[zone_id] = field
+        return field
+
+    def invalidate(self, zone_id: int):
+        with self._lock:
+            self._entries.pop(zone_id, None)
+            self._fields.pop(zone_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._fields.clear()
+
+grid_cache = GridCache(settings.GRID_CACHE_MAX_ZONES)
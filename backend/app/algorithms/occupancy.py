@@ -0,0 +1,127 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from app.core.config import settings
+
+# (spot_id, row, col, status) as loaded from the DB / Redis when a zone is first seen
+SpotState = Tuple[int, int, int, str]
+
+class OccupancyOverlay:
+    """
+    Per-zone bitmap of occupied spot cells, overlaid on the cached static grid at query time.
+    Only 'occupied' cells are blocked (a car is there); a 'reserved' spot is not free to assign
+    but stays routable, so the driver it was given can be routed to it.
+    Zones are seeded from a loader, then kept current by apply() calls fed from the spot
+    event stream, so routing never re-reads Redis or rebuilds the grid per request.
+    A seed is trusted for ttl seconds; after that the zone is re-seeded on next use.
+    """
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl  # 0: seeds never expire
+        self._lock = threading.Lock()
+        self._spots: Dict[int, Tuple[int, int, int]] = {}  # spot_id -> (zone_id, row, col)
+        self._occupied: Dict[int, bool] = {}  # spot_id -> occupied
+        self._zones: Dict[int, Tuple[int, int, bytearray]] = {}  # zone_id -> (rows, cols, bitmap)
+        self._free: Dict[int, Set[int]] = {}  # zone_id -> free spot ids
+        self._seeded: Dict[int, float] = {}  # zone_id -> monotonic time of the seed
+
+    def apply(self, spot_id: int, status: str) -> bool:
+        """Records a status transition. Returns False if the spot is not tracked yet."""
+        occupied = status == "occupied"
+        with self._lock:
+            location = self._spots.get(spot_id)
+            if location is None:
+                return False
+            self._occupied[spot_id] = occupied
+            zone_id, row, col = location
+            free = self._free.setdefault(zone_id, set())
+            if status == "free":
+                free.add(spot_id)
+            else:
+                free.discard(spot_id)
+            zone = self._zones.get(zone_id)
+            if zone is not None:
+                rows, cols, bitmap = zone
+                if 0 <= row < rows and 0 <= col < cols:
+                    bitmap[row * cols + col] = occupied
+        return True
+
+    def is_occupied(self, spot_id: int) -> Optional[bool]:
+        with self._lock:
+            return self._occupied.get(spot_id)
+
+    def is_seeded(self, zone_id: int) -> bool:
+        with self._lock:
+            seeded_at = self._seeded.get(zone_id)
+        if seeded_at is None:
+            return False
+        return not self.ttl or time.monotonic() - seeded_at < self.ttl
+
+    def seed(self, zone_id: int, states: Iterable[SpotState]):
+        """Starts tracking a zone from its current spot states (async callers load them first)."""
+        states = list(states)
+        with self._lock:
+            # Spots that left the zone since the previous seed are forgotten
+            current = {spot_id for spot_id, _, _, _ in states}
+            for spot_id in [s for s, loc in self._spots.items() if loc[0] == zone_id and s not in current]:
+                del self._spots[spot_id]
+                self._occupied.pop(spot_id, None)
+            free = set()
+            for spot_id, row, col, status in states:
+                self._spots[spot_id] = (zone_id, row, col)
+                self._occupied[spot_id] = status == "occupied"
+                if status == "free":
+                    free.add(spot_id)
+            self._free[zone_id] = free
+            self._seeded[zone_id] = time.monotonic()
+            self._zones.pop(zone_id, None)
+
+    def _ensure_seeded(self, zone_id: int, loader: Optional[Callable[[], Iterable[SpotState]]]):
+        if loader is None or self.is_seeded(zone_id):
+            return
+        self.seed(zone_id, loader())
+
+    def free_spots(self, zone_id: int, loader: Optional[Callable[[], Iterable[SpotState]]] = None) -> List[Tuple[int, int, int]]:
+        """Returns (spot_id, row, col) for every currently free spot of the zone."""
+        self._ensure_seeded(zone_id, loader)
+        with self._lock:
+            return [(spot_id,) + self._spots[spot_id][1:] for spot_id in self._free.get(zone_id, ())]
+
+    def bitmap(self, zone_id: int, rows: int, cols: int, loader: Optional[Callable[[], Iterable[SpotState]]] = None) -> bytearray:
+        """
+        Returns the occupancy bitmap for a zone laid out as rows x cols.
+        The loader is only called the first time a zone is seen (or after invalidate());
+        without one, the zone must have been seed()ed.
+        """
+        self._ensure_seeded(zone_id, loader)
+        with self._lock:
+            zone = self._zones.get(zone_id)
+            if zone is None or zone[0] != rows or zone[1] != cols:
+                # (Re)build from tracked spots, e.g. after a layout change resized the grid
+                bitmap = bytearray(rows * cols)
+                for spot_id, (spot_zone, row, col) in self._spots.items():
+                    if spot_zone == zone_id and 0 <= row < rows and 0 <= col < cols:
+                        bitmap[row * cols + col] = self._occupied.get(spot_id, False)
+                zone = (rows, cols, bitmap)
+                self._zones[zone_id] = zone
+            return zone[2]
+
+    def invalidate(self, zone_id: int):
+        """Forgets a zone so it is re-seeded on next use (e.g. after spots were added)."""
+        with self._lock:
+            self._seeded.pop(zone_id, None)
+            self._zones.pop(zone_id, None)
+            self._free.pop(zone_id, None)
+            for spot_id in [s for s, loc in self._spots.items() if loc[0] == zone_id]:
+                del self._spots[spot_id]
+                self._occupied.pop(spot_id, None)
+
+    def clear(self):
+        """Forgets every zone, e.g. after missing updates while the stream was down."""
+        with self._lock:
+            self._spots.clear()
+            self._occupied.clear()
+            self._zones.clear()
+            self._free.clear()
+            self._seeded.clear()
+
+occupancy_overlay = OccupancyOverlay(settings.OCCUPANCY_OVERLAY_TTL_SECONDS)
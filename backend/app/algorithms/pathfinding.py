@@ -1,95 +1,112 @@
 import heapq
-from typing import List, Tuple, Dict, Optional
+from array import array
+from typing import List, Tuple, Dict, Optional, Sequence
 
-class Node:
-    def __init__(self, parent=None, position=None):
-        self.parent = parent
-        self.position = position
-        self.g = 0
-        self.h = 0
-        self.f = 0
+# Adjacent squares as (row, col) offsets
+NEIGHBOURS = ((0, -1), (0, 1), (-1, 0), (1, 0))
 
-    def __eq__(self, other):
-        return self.position == other.position
-    
-    def __lt__(self, other):
-        return self.f < other.f
+# Grid values: 0=Road, 1=Wall, 2=Empty Spot, 3=Occupied Spot, 4=Entrance
+ROAD, WALL, EMPTY_SPOT, OCCUPIED_SPOT, ENTRANCE = 0, 1, 2, 3, 4
+# Lookup table indexed by cell value: 1 if a car may drive through the cell
+WALKABLE = bytes(1 if value in (ROAD, ENTRANCE) else 0 for value in range(256))
 
-def astar(grid: List[List[int]], start: Tuple[int, int], end: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+def flatten_grid(grid: List[List[int]]) -> Tuple[bytearray, int, int]:
     """
-    Returns a list of tuples as a path from the given start to the given end in the given maze.
-    Grid values: 0=Road, 1=Wall, 2=Empty Spot, 3=Occupied Spot
+    Packs a list-of-lists grid into a row-major bytearray.
+    Returns (cells, rows, cols). Rows shorter than the last row are padded with walls.
     """
-    
-    # Create start and end node
-    start_node = Node(None, start)
-    start_node.g = start_node.h = start_node.f = 0
-    end_node = Node(None, end)
-    end_node.g = end_node.h = end_node.f = 0
-    
-    # Initialize both open and closed list
-    open_list = []
-    closed_list = []
-    
-    # Add the start node
-    heapq.heappush(open_list, start_node)
-    
-    # Loop until you find the end
-    while len(open_list) > 0:
-        # Get the current node
-        current_node = heapq.heappop(open_list)
-        closed_list.append(current_node)
-        
+    rows = len(grid)
+    if rows == 0:
+        return bytearray(), 0, 0
+    cols = len(grid[rows - 1])
+    cells = bytearray([1]) * (rows * cols)
+    for r, row in enumerate(grid):
+        base = r * cols
+        for c, value in enumerate(row[:cols]):
+            cells[base + c] = value
+    return cells, rows, cols
+
+def astar_flat(cells: Sequence[int], rows: int, cols: int, start: Tuple[int, int], end: Tuple[int, int], blocked: Optional[Sequence[int]] = None) -> Optional[List[Tuple[int, int]]]:
+    """
+    A* over a row-major flat grid (see flatten_grid).
+    Cells are addressed by index (row * cols + col); g-scores, parents and the
+    closed set are flat arrays, and stale heap entries are skipped on pop (lazy deletion).
+    blocked is an optional same-sized overlay (e.g. live occupancy); non-zero cells are
+    impassable, including the goal.
+    """
+    end_r, end_c = end
+    if not (0 <= start[0] < rows and 0 <= start[1] < cols):
+        return None
+    if not (0 <= end_r < rows and 0 <= end_c < cols):
+        return None
+
+    start_i = start[0] * cols + start[1]
+    end_i = end_r * cols + end_c
+    size = rows * cols
+    if blocked is not None and blocked[end_i]:
+        return None
+
+    g_score = array('i', [-1]) * size
+    parent = array('i', [-1]) * size
+    closed = bytearray(size)
+
+    g_score[start_i] = 0
+    # Heap entries: (f, h, index). Ties on f prefer the node closer to the goal.
+    h = abs(start[0] - end_r) + abs(start[1] - end_c)
+    open_heap = [(h, h, start_i)]
+
+    while open_heap:
+        _, _, i = heapq.heappop(open_heap)
+        if closed[i]:
+            continue
+        closed[i] = 1
+
         # Found the goal
-        if current_node == end_node:
+        if i == end_i:
             path = []
-            current = current_node
-            while current is not None:
-                path.append(current.position)
-                current = current.parent
-            return path[::-1] # Return reversed path
-        
-        # Generate children
-        children = []
-        for new_position in [(0, -1), (0, 1), (-1, 0), (1, 0)]: # Adjacent squares
-            
-            # Get node position
-            node_position = (current_node.position[0] + new_position[0], current_node.position[1] + new_position[1])
-            
-            # Make sure within range
-            if node_position[0] > (len(grid) - 1) or node_position[0] < 0 or node_position[1] > (len(grid[len(grid)-1]) -1) or node_position[1] < 0:
+            while i != -1:
+                path.append(divmod(i, cols))
+                i = parent[i]
+            return path[::-1]
+
+        r, c = divmod(i, cols)
+        child_g = g_score[i] + 1
+        for dr, dc in NEIGHBOURS:
+            nr = r + dr
+            nc = c + dc
+            if nr < 0 or nr >= rows or nc < 0 or nc >= cols:
                 continue
-            
-            # Make sure walkable terrain
-            # 0=Road, 1=Wall, 2=Empty (Goal), 3=Occupied (Obstacle)
-            # Can walk on Road (0)
+            j = nr * cols + nc
+            if closed[j]:
+                continue
+
+            # 0=Road, 1=Wall, 2=Empty (Goal), 3=Occupied (Obstacle), 4=Entrance
+            # Can walk on Road (0) and Entrances (4)
             # Can walk on Spot ONLY if it is the Goal
-            if grid[node_position[0]][node_position[1]] != 0 and node_position != end:
+            if not WALKABLE[cells[j]] and j != end_i:
                 continue
-                
-            new_node = Node(current_node, node_position)
-            children.append(new_node)
-            
-        # Loop through children
-        for child in children:
-            # Child is on the closed list
-            if child in closed_list:
+            if blocked is not None and blocked[j]:
                 continue
-            
-            # Create the f, g, and h values
-            child.g = current_node.g + 1
-            child.h = ((child.position[0] - end_node.position[0]) ** 2) + ((child.position[1] - end_node.position[1]) ** 2)
-            child.f = child.g + child.h
-            
-            # Child is already in the open list
-            if len([open_node for open_node in open_list if child == open_node and child.g > open_node.g]) > 0:
+
+            known_g = g_score[j]
+            if known_g != -1 and known_g <= child_g:
                 continue
-            
-            # Add the child to the open list
-            heapq.heappush(open_list, child)
-            
+            g_score[j] = child_g
+            parent[j] = i
+            h = abs(nr - end_r) + abs(nc - end_c)
+            heapq.heappush(open_heap, (child_g + h, h, j))
+
     return None
 
+def astar(grid: List[List[int]], start: Tuple[int, int], end: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+    """
+    Returns a list of tuples as a path from the given start to the given end in the given maze.
+    Grid values: 0=Road, 1=Wall, 2=Empty Spot, 3=Occupied Spot, 4=Entrance
+    Uses the admissible Manhattan heuristic, so the returned path is a shortest path.
+    """
+    cells, rows, cols = flatten_grid(grid)
+    return astar_flat(cells, rows, cols, start, end)
+
 def path_to_instructions(path: List[Tuple[int, int]]) -> List[str]:
     """
     Converts a coordinate path to directional instructions.
@@ -3,9 +3,10 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core import security
 from app.core.config import settings
+from app.core.principal_cache import Principal, claims_trusted, principal_cache
 from app.database import get_session
 from app.models import User
 
@@ -13,24 +14,50 @@ reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/auth/login"
 )
 
-def get_current_user(
-    session: Session = Depends(get_session),
-    token: str = Depends(reusable_oauth2)
-) -> User:
+async def get_principal_from_token(session: AsyncSession, token: str) -> Principal:
+    """
+    Decodes a bearer token into the caller's principal; shared by HTTP and WebSocket auth.
+    Served from the principal cache, else from the token's org/role claims, and only
+    loads the user when neither can be used (old tokens, recently changed users).
+    """
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        token_data = payload.get("sub")
-    except (JWTError, ValidationError):
+        user_id = int(payload.get("sub"))
+        if payload.get("type") == security.REFRESH_TOKEN_TYPE:
+            raise ValueError("refresh tokens are not access tokens")
+    except (JWTError, ValidationError, TypeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, int(token_data))
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    if "org" in payload and "role" in payload and await claims_trusted(user_id, payload.get("iat")):
+        principal = Principal(user_id, payload["org"], payload["role"])
+    else:
+        user = await session.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal(user.id, user.organization_id, user.role)
+    principal_cache.put(principal)
+    return principal
+
+async def get_current_user(
+    session: AsyncSession = Depends(get_session),
+    token: str = Depends(reusable_oauth2)
+) -> Principal:
+    return await get_principal_from_token(session, token)
+
+async def get_current_active_user(
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
+    return current_user
 
-def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+async def get_current_admin(
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
+    if current_user.role != "admin":
+        raise HTTPException(status_code=400, detail="Not enough permissions")
     return current_user
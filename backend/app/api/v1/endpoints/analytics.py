@@ -1,31 +1,179 @@
-from typing import Any
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select, func
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app import models
 from app.api import deps
+from app.core.config import settings
 from app.database import get_session
+from app.occupancy_history import hour_floor
+from app.redis_client import async_redis_client
 
 router = APIRouter()
 
+def occupancy_cache_key(organization_id: int) -> str:
+    return f"analytics:occupancy:{organization_id}"
+
+def occupancy_query(organization_id: int):
+    """(zone id, zone name, spots, occupied spots) per zone of the organization."""
+    spot = models.Spot
+    zone = models.Zone
+    occupied = func.coalesce(func.sum(case((spot.status == "occupied", 1), else_=0)), 0)
+    return (
+        select(zone.id, zone.name, func.count(spot.id), occupied)
+        .outerjoin(spot, spot.zone_id == zone.id)
+        .where(zone.organization_id == organization_id)
+        .group_by(zone.id, zone.name)
+        .order_by(zone.id)
+    )
+
+async def compute_occupancy(session: AsyncSession, organization_id: int) -> dict:
+    """Per-zone and total spot counts for an organization, in one grouped query."""
+    rows = (await session.exec(occupancy_query(organization_id))).all()
+
+    def counts(total_spots: int, occupied_spots: int) -> dict:
+        return {
+            "total_spots": total_spots,
+            "occupied_spots": occupied_spots,
+            "free_spots": total_spots - occupied_spots,
+            "occupancy_rate": (occupied_spots / total_spots) * 100 if total_spots > 0 else 0,
+        }
+
+    return {
+        **counts(sum(row[2] for row in rows), sum(row[3] for row in rows)),
+        "zones": [{"zone_id": zone_id, "zone_name": name, **counts(total, occ)} for zone_id, name, total, occ in rows],
+    }
+
 @router.get("/occupancy")
-def get_occupancy(
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(deps.get_current_user),
+async def get_occupancy(
+    session: AsyncSession = Depends(get_session),
+    current_user: deps.Principal = Depends(deps.get_current_user),
+) -> Any:
+    # Dashboards poll this every few seconds; serve from a short-lived Redis copy when possible
+    key = occupancy_cache_key(current_user.organization_id)
+    try:
+        cached = await async_redis_client.get(key)
+        if cached:
+            return json.loads(cached)
+    except Exception as e:
+        print(f"Occupancy cache unavailable: {e}")
+
+    result = await compute_occupancy(session, current_user.organization_id)
+    try:
+        await async_redis_client.set(key, json.dumps(result), ex=settings.ANALYTICS_CACHE_TTL_SECONDS)
+    except Exception as e:
+        print(f"Occupancy cache unavailable: {e}")
+    return result
+
+async def rollup_conditions(session: AsyncSession, current_user: deps.Principal, zone_id: Optional[int], since: datetime) -> list:
+    """WHERE clauses restricting occupancy rollups to the user's organization (or one of its zones)."""
+    conditions = [
+        models.OccupancyRollup.organization_id == current_user.organization_id,
+        models.OccupancyRollup.bucket >= since,
+    ]
+    if zone_id is not None:
+        zone = await session.get(models.Zone, zone_id)
+        if not zone:
+            raise HTTPException(status_code=404, detail="Zone not found")
+        if zone.organization_id != current_user.organization_id:
+            raise HTTPException(status_code=400, detail="Not enough permissions")
+        conditions.append(models.OccupancyRollup.zone_id == zone_id)
+    return conditions
+
+def occupancy_rate(occupied_seconds: float, capacity_seconds: float) -> float:
+    return (occupied_seconds / capacity_seconds) * 100 if capacity_seconds else 0
+
+@router.get("/occupancy/history")
+async def get_occupancy_history(
+    session: AsyncSession = Depends(get_session),
+    current_user: deps.Principal = Depends(deps.get_current_user),
+    hours: int = Query(default=24, ge=1, le=24 * 90),
+    zone_id: Optional[int] = None,
+) -> Any:
+    """Hourly occupancy rate, arrivals and departures over the last `hours`, from the rollups."""
+    since = hour_floor(datetime.now(timezone.utc)) - timedelta(hours=hours - 1)
+    rollup = models.OccupancyRollup
+    rows = (await session.exec(
+        select(
+            rollup.bucket,
+            func.sum(rollup.occupied_seconds),
+            func.sum(rollup.capacity_seconds),
+            func.sum(rollup.arrivals),
+            func.sum(rollup.departures),
+        )
+        .where(*await rollup_conditions(session, current_user, zone_id, since))
+        .group_by(rollup.bucket)
+        .order_by(rollup.bucket)
+    )).all()
+    return [
+        {
+            "bucket": bucket,
+            "occupancy_rate": occupancy_rate(occupied, capacity),
+            "arrivals": arrivals,
+            "departures": departures,
+        }
+        for bucket, occupied, capacity, arrivals, departures in rows
+    ]
+
+@router.get("/peak-hours")
+async def get_peak_hours(
+    session: AsyncSession = Depends(get_session),
+    current_user: deps.Principal = Depends(deps.get_current_user),
+    days: int = Query(default=7, ge=1, le=90),
+    zone_id: Optional[int] = None,
+    top: int = Query(default=3, ge=1, le=24),
+) -> Any:
+    """Average occupancy rate by hour of day (UTC) over the last `days`, and the busiest hours."""
+    since = hour_floor(datetime.now(timezone.utc)) - timedelta(days=days)
+    rollup = models.OccupancyRollup
+    rows = (await session.exec(
+        select(rollup.bucket, func.sum(rollup.occupied_seconds), func.sum(rollup.capacity_seconds))
+        .where(*await rollup_conditions(session, current_user, zone_id, since))
+        .group_by(rollup.bucket)
+    )).all()
+    occupied_by_hour = [0.0] * 24
+    capacity_by_hour = [0.0] * 24
+    for bucket, occupied, capacity in rows:
+        occupied_by_hour[bucket.hour] += occupied
+        capacity_by_hour[bucket.hour] += capacity
+    by_hour = [
+        {"hour": hour, "occupancy_rate": occupancy_rate(occupied_by_hour[hour], capacity_by_hour[hour])}
+        for hour in range(24)
+    ]
+    return {
+        "hours": by_hour,
+        "peak_hours": sorted(by_hour, key=lambda h: h["occupancy_rate"], reverse=True)[:top],
+    }
+
+@router.get("/dwell")
+async def get_average_dwell(
+    session: AsyncSession = Depends(get_session),
+    current_user: deps.Principal = Depends(deps.get_current_user),
+    days: int = Query(default=7, ge=1, le=90),
+    zone_id: Optional[int] = None,
 ) -> Any:
-    # Get all zones for the org
-    zones = session.exec(select(models.Zone).where(models.Zone.organization_id == current_user.organization_id)).all()
-    zone_ids = [z.id for z in zones]
-    
-    if not zone_ids:
-        return {"total_spots": 0, "occupied_spots": 0, "free_spots": 0, "occupancy_rate": 0}
-
-    # Count spots
-    total_spots = session.exec(select(func.count(models.Spot.id)).where(models.Spot.zone_id.in_(zone_ids))).one()
-    occupied_spots = session.exec(select(func.count(models.Spot.id)).where(models.Spot.zone_id.in_(zone_ids), models.Spot.status == "occupied")).one()
-    
+    """Average stay length of the vehicles that left over the last `days`, overall and per zone."""
+    since = hour_floor(datetime.now(timezone.utc)) - timedelta(days=days)
+    rollup = models.OccupancyRollup
+    rows = (await session.exec(
+        select(rollup.zone_id, func.sum(rollup.dwell_seconds), func.sum(rollup.departures))
+        .where(*await rollup_conditions(session, current_user, zone_id, since))
+        .group_by(rollup.zone_id)
+    )).all()
+    total_dwell = sum(dwell for _, dwell, _ in rows)
+    total_departures = sum(departures for _, _, departures in rows)
     return {
-        "total_spots": total_spots,
-        "occupied_spots": occupied_spots,
-        "free_spots": total_spots - occupied_spots,
-        "occupancy_rate": (occupied_spots / total_spots) * 100 if total_spots > 0 else 0
+        "average_dwell_seconds": total_dwell / total_departures if total_departures else 0,
+        "departures": total_departures,
+        "zones": [
+            {
+                "zone_id": zone,
+                "average_dwell_seconds": dwell / departures if departures else 0,
+                "departures": departures,
+            }
+            for zone, dwell, departures in rows
+        ],
     }
@@ -2,33 +2,92 @@ from datetime import timedelta
 from typing import Any
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
+from jose import jwt, JWTError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app import models, schemas
+from app.api import deps
 from app.core import security
+from app.core.hashing import password_hasher
 from app.database import get_session
 from app.core.config import settings
 
 router = APIRouter()
 
+def issue_tokens(user: models.User) -> dict:
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = security.create_access_token(
+        subject=user.id, expires_delta=access_token_expires,
+        claims={"org": user.organization_id, "role": user.role},
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": security.create_refresh_token(user.id),
+        "token_type": "bearer",
+    }
+
 @router.post("/login", response_model=schemas.Token)
-def login_access_token(
-    session: Session = Depends(get_session),
+async def login_access_token(
+    session: AsyncSession = Depends(get_session),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     statement = select(models.User).where(models.User.email == form_data.username)
-    user = session.exec(statement).first()
+    user = (await session.exec(statement)).first()
     
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    # bcrypt is CPU-bound; it runs on the bounded password hashing executor
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect email or password",
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return issue_tokens(user)
+
+@router.post("/refresh", response_model=schemas.Token)
+async def refresh_access_token(
+    token_in: schemas.TokenRefresh,
+    session: AsyncSession = Depends(get_session),
+) -> Any:
+    """Trades a refresh token for new tokens, without a password check."""
+    try:
+        payload = jwt.decode(token_in.refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if payload.get("type") != security.REFRESH_TOKEN_TYPE:
+            raise ValueError("not a refresh token")
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    # The user is re-read so that role/org changes reach the new access token
+    user = await session.get(models.User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return issue_tokens(user)
+
+@router.post("/service-token", response_model=schemas.Token)
+async def create_service_token(
+    token_in: schemas.ServiceTokenCreate,
+    current_user: deps.Principal = Depends(deps.get_current_admin),
+) -> Any:
+    """
+    Long-lived access token for a machine client (e.g. an AI worker's WORKER_SERVICE_TOKEN),
+    acting as the calling admin, so the client never has to log in with a password.
+    It carries no org/role claims: every use resolves the user through the principal
+    cache and the DB, so demoting or deleting the admin also cuts off its service tokens.
+    """
+    expires_days = token_in.expires_days or settings.SERVICE_TOKEN_EXPIRE_DAYS
+    if not 0 < expires_days <= settings.SERVICE_TOKEN_EXPIRE_DAYS:
+        raise HTTPException(status_code=400, detail="Invalid expiry")
     access_token = security.create_access_token(
-        subject=user.id, expires_delta=access_token_expires
+        subject=current_user.id, expires_delta=timedelta(days=expires_days),
+        claims={"type": security.SERVICE_TOKEN_TYPE},
     )
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-    }
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.get("/metrics")
+async def password_hash_metrics(
+    current_user: deps.Principal = Depends(deps.get_current_admin),
+) -> Any:
+    """Password hashing executor load: running/waiting hashes, queue times, rejections."""
+    return password_hasher.metrics()
@@ -1,29 +1,96 @@
+from collections import defaultdict
 from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app import models, schemas
 from app.api import deps
+from app.core.config import settings
 from app.database import get_session
+from app.redis_client import get_worker_config_version, notify_worker_config_changed
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.CameraRead])
-def read_cameras(
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(deps.get_current_user),
+async def read_cameras(
+    session: AsyncSession = Depends(get_session),
+    current_user: deps.Principal = Depends(deps.get_current_user),
     skip: int = 0,
     limit: int = 100,
 ) -> Any:
     statement = select(models.Camera).where(models.Camera.organization_id == current_user.organization_id).offset(skip).limit(limit)
-    cameras = session.exec(statement).all()
+    cameras = (await session.exec(statement)).all()
     return cameras
 
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+@router.get("/worker-config", response_model=schemas.WorkerConfigPage)
+async def read_worker_config(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    current_user: deps.Principal = Depends(deps.get_current_user),
+    after: int = 0,
+    limit: int = settings.WORKER_CONFIG_PAGE_SIZE,
+) -> Any:
+    """
+    Every camera of the organization with its zone's spot geometry, for the AI workers:
+    keyset-paginated by camera id (two queries per page, however many zones), with an
+    ETag from the organization's config version so an unchanged poll is answered with
+    304 from Redis alone. All pages of one version carry the same ETag.
+    """
+    limit = max(1, min(limit, settings.WORKER_CONFIG_MAX_PAGE_SIZE))
+    # Read before the queries: a change racing this request bumps the version past it
+    version = await get_worker_config_version(current_user.organization_id)
+    if version is not None:
+        etag = f'"{current_user.organization_id}.{version}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    statement = (
+        select(models.Camera)
+        .where(models.Camera.organization_id == current_user.organization_id, models.Camera.id > after)
+        .order_by(models.Camera.id)
+        .limit(limit)
+    )
+    cameras = (await session.exec(statement)).all()
+
+    spots_by_zone = defaultdict(list)
+    zone_ids = {camera.zone_id for camera in cameras if camera.zone_id is not None}
+    if zone_ids:
+        spot_statement = (
+            select(models.Spot.zone_id, models.Spot.id, models.Spot.x1, models.Spot.y1, models.Spot.x2, models.Spot.y2)
+            .where(models.Spot.zone_id.in_(zone_ids))
+            .order_by(models.Spot.id)
+        )
+        for zone_id, *spot in (await session.exec(spot_statement)).all():
+            spots_by_zone[zone_id].append(spot)
+
+    return {
+        "cameras": [
+            {
+                "id": camera.id,
+                "rtsp_url": camera.rtsp_url,
+                "type": camera.type,
+                "zone_id": camera.zone_id,
+                "organization_id": camera.organization_id,
+                "spots": spots_by_zone.get(camera.zone_id, []),
+            }
+            for camera in cameras
+        ],
+        "next_after": cameras[-1].id if len(cameras) == limit else None,
+    }
+
 @router.post("/connect", response_model=schemas.CameraRead)
-def connect_camera(
+async def connect_camera(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     camera_in: schemas.CameraCreate,
-    current_user: models.User = Depends(deps.get_current_user),
+    current_user: deps.Principal = Depends(deps.get_current_user),
 ) -> Any:
     # Future: check plan limits here
     camera = models.Camera(
@@ -31,6 +98,7 @@ def connect_camera(
         organization_id=current_user.organization_id
     )
     session.add(camera)
-    session.commit()
-    session.refresh(camera)
+    await session.commit()
+    await session.refresh(camera)
+    await notify_worker_config_changed(camera.organization_id)
     return camera
@@ -1,36 +1,83 @@
-from typing import Any, List
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app import models, schemas
 from app.api import deps
 from app.database import get_session
-from app.algorithms.pathfinding import astar, path_to_instructions
-import json
+from app.algorithms.pathfinding import astar_flat, path_to_instructions
+from app.algorithms.grid_cache import grid_cache
+from app.algorithms.occupancy import occupancy_overlay
+from app.redis_client import async_redis_client, append_spot_event
+from app import reservations
 
 router = APIRouter()
 
+async def load_zone_spot_states(session: AsyncSession, zone_ids: List[int]) -> Dict[int, list]:
+    """
+    Seeds the occupancy overlay for zones: spot grid cells from the DB and the
+    latest real-time status from Redis (falling back to the DB status).
+    One query and one MGET however many zones and spots are loaded.
+    """
+    states = {zone_id: [] for zone_id in zone_ids}
+    spots = (await session.exec(
+        select(models.Spot.zone_id, models.Spot.id, models.Spot.y1, models.Spot.x1, models.Spot.status)
+        .where(models.Spot.zone_id.in_(zone_ids))
+    )).all()
+    if not spots:
+        return states
+    live_statuses = await async_redis_client.mget([f"spot:{spot_id}:status" for _, spot_id, _, _, _ in spots])
+    for (zone_id, spot_id, row, col, status), live_status in zip(spots, live_statuses):
+        # A persisted 'reserved' with no live status is a reservation that has since expired
+        if live_status is None and status == "reserved":
+            status = "free"
+        states[zone_id].append((spot_id, row, col, live_status or status))
+    return states
+
+async def ensure_zones_seeded(session: AsyncSession, zone_ids: List[int]):
+    """Loads zones into the occupancy overlay the first time they are needed."""
+    missing = [zone_id for zone_id in zone_ids if not occupancy_overlay.is_seeded(zone_id)]
+    if missing:
+        for zone_id, states in (await load_zone_spot_states(session, missing)).items():
+            occupancy_overlay.seed(zone_id, states)
+
+async def load_raw_grids(session: AsyncSession, zone_ids: List[int]) -> Dict[int, Tuple[int, str]]:
+    """zone_id -> (grid_version, map_grid_data) of the zones that have a grid, in one query (cache misses)."""
+    rows = (await session.exec(
+        select(models.Zone.id, models.Zone.grid_version, models.Zone.map_grid_data)
+        .where(models.Zone.id.in_(zone_ids), models.Zone.map_grid_data != None)
+    )).all()
+    return {zone_id: (version, map_grid_data) for zone_id, version, map_grid_data in rows if map_grid_data}
+
 @router.get("/route")
-def get_route(
+async def get_route(
     target_spot_id: int,
     start_x: int = 0,
     start_y: int = 0,
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(deps.get_current_user),
+    live: bool = False,
+    session: AsyncSession = Depends(get_session),
+    current_user: deps.Principal = Depends(deps.get_current_user),
 ) -> Any:
     # Get Spot
-    spot = session.get(models.Spot, target_spot_id)
+    spot = await session.get(models.Spot, target_spot_id)
     if not spot:
         raise HTTPException(status_code=404, detail="Spot not found")
         
-    # Get Zone (Grid)
-    zone = session.get(models.Zone, spot.zone_id)
-    if not zone or not zone.map_grid_data:
-        raise HTTPException(status_code=404, detail="Zone specific grid data not found")
-        
-    try:
-        grid = json.loads(zone.map_grid_data)
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail="Invalid grid data")
+    # Get Zone (Grid). Only the zone's grid version is fetched; the raw grid is
+    # loaded and parsed only when the cache does not hold that layout yet.
+    version = (await session.exec(
+        select(models.Zone.grid_version).where(models.Zone.id == spot.zone_id)
+    )).first()
+    grid = grid_cache.get(spot.zone_id, version)
+    if grid is None:
+        raw_grids = await load_raw_grids(session, [spot.zone_id])
+        if spot.zone_id not in raw_grids:
+            raise HTTPException(status_code=404, detail="Zone specific grid data not found")
+        try:
+            grid = grid_cache.put(spot.zone_id, *raw_grids[spot.zone_id])
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=500, detail="Invalid grid data")
         
     # A* Algorithm
     # Note: Grid should be row-major, so coords are (y, x) usually, or (row, col)
@@ -38,7 +85,14 @@ def get_route(
     start_pos = (start_y, start_x)
     end_pos = (spot.y1, spot.x1)
     
-    path = astar(grid, start_pos, end_pos)
+    # Live mode overlays real-time spot occupancy on the cached static grid
+    blocked = None
+    if live:
+        await ensure_zones_seeded(session, [spot.zone_id])
+        blocked = occupancy_overlay.bitmap(spot.zone_id, grid.rows, grid.cols)
+    
+    # The search is CPU-bound; run it off the event loop
+    path = await asyncio.to_thread(astar_flat, grid.cells, grid.rows, grid.cols, start_pos, end_pos, blocked)
     
     if not path:
         return {"error": "No path found"}
@@ -50,47 +104,143 @@ def get_route(
         "instructions": instructions
     }
 
+async def publish_reserved(spot_id: int, organization_id: int, zone_id: Optional[int]):
+    """Announces a reservation so dashboards and the routing overlay see it."""
+    await append_spot_event([(spot_id, "reserved")], organization_id, zone_id)
+
+async def reserve_unreported_spot(session: AsyncSession, organization_id: int, zone_id: Optional[int] = None) -> Optional[int]:
+    """
+    Fallback for spots the AI worker has not reported yet (so they are in no Redis free set):
+    one DB query for spots marked free (or reserved, since expired reservations are
+    persisted as such), one MGET to skip those with a live status, then an atomic
+    reserve attempt per remaining candidate (which refuses still-active reservations).
+    """
+    statement = select(models.Spot.id, models.Spot.zone_id).join(models.Zone).where(
+        models.Zone.organization_id == organization_id,
+        models.Spot.status.in_(("free", "reserved")),
+    )
+    if zone_id is not None:
+        statement = statement.where(models.Zone.id == zone_id)
+    candidates = (await session.exec(statement)).all()
+    if not candidates:
+        return None
+    live_statuses = await async_redis_client.mget([f"spot:{spot_id}:status" for spot_id, _ in candidates])
+    for (spot_id, spot_zone_id), live_status in zip(candidates, live_statuses):
+        if live_status in (None, "reserved") and await reservations.reserve_spot(spot_id, spot_zone_id, organization_id):
+            return spot_id
+    return None
+
 @router.post("/assign")
-def assign_spot(
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(deps.get_current_user),
+async def assign_spot(
+    zone_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: deps.Principal = Depends(deps.get_current_user),
 ) -> Any:
-    # Logic: Find the first 'free' spot in any of the user's organization's zones
+    # Logic: Atomically take any free spot of the user's organization (or of one zone)
     if not current_user.organization_id:
          raise HTTPException(status_code=400, detail="User not part of an organization")
 
-    # Get Organization Zones
-    org = session.get(models.Organization, current_user.organization_id)
-    if not org:
-        raise HTTPException(status_code=404, detail="Organization not found")
+    if zone_id is not None:
+        zone_org_id = (await session.exec(select(models.Zone.organization_id).where(models.Zone.id == zone_id))).first()
+        if zone_org_id is None:
+            raise HTTPException(status_code=404, detail="Zone not found")
+        if zone_org_id != current_user.organization_id:
+            raise HTTPException(status_code=400, detail="Not enough permissions")
 
-    # Iterate through zones and spots
-    # In a real app, we would query Redis for "free" spots directly to avoid DB overhead
-    # For now, we iterate DB spots and check Redis status
-    
-    import redis
-    import os
-    redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
-    r = redis.Redis.from_url(redis_url, decode_responses=True)
-
-    for zone in org.zones:
-        for spot in zone.spots:
-            # Check Redis status first (real-time)
-            status = r.get(f"spot:{spot.id}:status")
-            
-            # If no status in Redis, fallback to DB status (default 'free')
-            if not status:
-                status = spot.status
-            
-            if status == 'free':
-                # Found a free spot!
-                # We could "reserve" it here to prevent race conditions
-                # r.set(f"spot:{spot.id}:status", "reserved")
-                return {
-                    "spot_id": spot.id, 
-                    "spot_name": spot.name,
-                    "zone_name": zone.name,
-                    "message": "Spot assigned successfully"
-                }
-    
-    raise HTTPException(status_code=404, detail="No free spots available")
+    # The worker keeps per-org/per-zone sets of free spots in Redis; a Lua script
+    # pops one and marks it reserved, so concurrent drivers never get the same spot.
+    spot_id = await reservations.pop_free_spot(current_user.organization_id, zone_id)
+    if spot_id is None:
+        spot_id = await reserve_unreported_spot(session, current_user.organization_id, zone_id)
+    if spot_id is None:
+        raise HTTPException(status_code=404, detail="No free spots available")
+
+    spot_name, spot_zone_id, zone_name = (await session.exec(
+        select(models.Spot.name, models.Spot.zone_id, models.Zone.name).join(models.Zone).where(models.Spot.id == spot_id)
+    )).one()
+    await publish_reserved(spot_id, current_user.organization_id, spot_zone_id)
+    return {
+        "spot_id": spot_id,
+        "spot_name": spot_name,
+        "zone_name": zone_name,
+        "message": "Spot assigned successfully"
+    }
+
+def nearest_candidates(zones, entrance: int, raw_grids: Dict[int, Tuple[int, str]]) -> list:
+    """
+    Free spots of the (already seeded) zones reachable from the entrance, nearest first,
+    as (distance, spot_id, zone_id, zone_name, field, row, col). Grids not cached at
+    their version are parsed from raw_grids.
+    """
+    candidates = []
+    for zid, zone_name, version in zones:
+        grid = grid_cache.get(zid, version)
+        if grid is None:
+            if zid not in raw_grids:
+                continue
+            try:
+                grid = grid_cache.put(zid, *raw_grids[zid])
+            except (ValueError, TypeError):
+                continue
+        field = grid_cache.distance_field(zid, grid)
+        if entrance >= len(field.entrances):
+            continue
+        for spot_id, row, col in occupancy_overlay.free_spots(zid):
+            distance = field.distance(entrance, row, col)
+            if distance is not None:
+                candidates.append((distance, spot_id, zid, zone_name, field, row, col))
+    candidates.sort(key=lambda candidate: candidate[0])
+    return candidates
+
+@router.post("/assign-nearest")
+async def assign_nearest_spot(
+    entrance: int = 0,
+    zone_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+    current_user: deps.Principal = Depends(deps.get_current_user),
+) -> Any:
+    """
+    Assigns the free spot closest to the given entrance and returns its route in one call.
+    Distances come from per-zone BFS fields precomputed per grid layout, so this is one
+    lookup per free spot plus a path backtrack.
+    """
+    if not current_user.organization_id:
+         raise HTTPException(status_code=400, detail="User not part of an organization")
+    if entrance < 0:
+        raise HTTPException(status_code=400, detail="Invalid entrance")
+
+    statement = select(models.Zone.id, models.Zone.name, models.Zone.grid_version).where(
+        models.Zone.organization_id == current_user.organization_id,
+        models.Zone.map_grid_data != None,
+    )
+    if zone_id is not None:
+        statement = statement.where(models.Zone.id == zone_id)
+
+    zones = (await session.exec(statement)).all()
+    await ensure_zones_seeded(session, [zid for zid, _, _ in zones])
+    # Raw grids are only loaded for layouts not cached yet
+    missing = [zid for zid, _, version in zones if grid_cache.get(zid, version) is None]
+    raw_grids = await load_raw_grids(session, missing) if missing else {}
+    # Grid parsing and BFS fields (on first use of a layout) are CPU-bound
+    candidates = await asyncio.to_thread(nearest_candidates, zones, entrance, raw_grids)
+
+    # Nearest first; another driver may have just taken a spot, so reserve atomically
+    for distance, spot_id, zid, zone_name, field, row, col in candidates:
+        if await reservations.reserve_spot(spot_id, zid, current_user.organization_id):
+            break
+    else:
+        raise HTTPException(status_code=404, detail="No free spots available")
+
+    await publish_reserved(spot_id, current_user.organization_id, zid)
+    occupancy_overlay.apply(spot_id, "reserved")
+    path = field.path(entrance, row, col)
+    spot = await session.get(models.Spot, spot_id)
+    return {
+        "spot_id": spot_id,
+        "spot_name": spot.name if spot else None,
+        "zone_name": zone_name,
+        "distance": distance,
+        "path": path,
+        "instructions": path_to_instructions(path),
+        "message": "Spot assigned successfully"
+    }
@@ -1,31 +1,44 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app import models, schemas
 from app.api import deps
 from app.database import get_session
+from app.redis_client import notify_worker_config_changed
+from app.algorithms.grid_cache import grid_cache
+from app.algorithms.occupancy import occupancy_overlay
 
 router = APIRouter()
 
+# ZoneRead serializes these relationships; lazy loading is not available under asyncio
+ZONE_READ_OPTIONS = (selectinload(models.Zone.spots), selectinload(models.Zone.camera))
+
 @router.get("/", response_model=List[schemas.ZoneRead])
-def read_zones(
-    session: Session = Depends(get_session),
-    current_user: models.User = Depends(deps.get_current_user),
+async def read_zones(
+    session: AsyncSession = Depends(get_session),
+    current_user: deps.Principal = Depends(deps.get_current_user),
     skip: int = 0,
     limit: int = 100,
 ) -> Any:
-    statement = select(models.Zone).where(models.Zone.organization_id == current_user.organization_id).offset(skip).limit(limit)
-    zones = session.exec(statement).all()
+    statement = (
+        select(models.Zone)
+        .where(models.Zone.organization_id == current_user.organization_id)
+        .options(*ZONE_READ_OPTIONS)
+        .offset(skip).limit(limit)
+    )
+    zones = (await session.exec(statement)).all()
     return zones
 
 @router.get("/{zone_id}", response_model=schemas.ZoneRead)
-def read_zone(
+async def read_zone(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     zone_id: int,
-    current_user: models.User = Depends(deps.get_current_user),
+    current_user: deps.Principal = Depends(deps.get_current_user),
 ) -> Any:
-    zone = session.get(models.Zone, zone_id)
+    zone = await session.get(models.Zone, zone_id, options=ZONE_READ_OPTIONS)
     if not zone:
         raise HTTPException(status_code=404, detail="Zone not found")
     if zone.organization_id != current_user.organization_id:
@@ -33,30 +46,59 @@ def read_zone(
     return zone
 
 @router.post("/", response_model=schemas.ZoneRead)
-def create_zone(
+async def create_zone(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     zone_in: schemas.ZoneCreate,
-    current_user: models.User = Depends(deps.get_current_user),
+    current_user: deps.Principal = Depends(deps.get_current_user),
 ) -> Any:
     zone = models.Zone(
         **zone_in.dict(),
         organization_id=current_user.organization_id
     )
     session.add(zone)
-    session.commit()
-    session.refresh(zone)
+    await session.commit()
+    await session.refresh(zone, ["spots", "camera"])
+    return zone
+
+@router.patch("/{zone_id}", response_model=schemas.ZoneRead)
+async def update_zone(
+    *,
+    session: AsyncSession = Depends(get_session),
+    zone_id: int,
+    zone_in: schemas.ZoneUpdate,
+    current_user: deps.Principal = Depends(deps.get_current_user),
+) -> Any:
+    zone = await session.get(models.Zone, zone_id, options=ZONE_READ_OPTIONS)
+    if not zone:
+        raise HTTPException(status_code=404, detail="Zone not found")
+    if zone.organization_id != current_user.organization_id:
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+
+    changes = zone_in.dict(exclude_unset=True)
+    for field, value in changes.items():
+        setattr(zone, field, value)
+    if "map_grid_data" in changes:
+        # In SQL, so concurrent edits never end up sharing a version
+        zone.grid_version = models.Zone.grid_version + 1
+    session.add(zone)
+    await session.commit()
+    if "map_grid_data" in changes:
+        await session.refresh(zone, ["grid_version"])
+
+    # Drop the parsed grid so the next route request re-reads the new layout
+    grid_cache.invalidate(zone_id)
     return zone
 
 @router.post("/{zone_id}/spots", response_model=schemas.SpotRead)
-def create_spot(
+async def create_spot(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     zone_id: int,
     spot_in: schemas.SpotCreate,
-    current_user: models.User = Depends(deps.get_current_user),
+    current_user: deps.Principal = Depends(deps.get_current_user),
 ) -> Any:
-    zone = session.get(models.Zone, zone_id)
+    zone = await session.get(models.Zone, zone_id)
     if not zone:
         raise HTTPException(status_code=404, detail="Zone not found")
     if zone.organization_id != current_user.organization_id:
@@ -67,6 +109,11 @@ def create_spot(
         zone_id=zone_id
     )
     session.add(spot)
-    session.commit()
-    session.refresh(spot)
+    await session.commit()
+    await session.refresh(spot)
+
+    # Re-seed live occupancy for this zone so the new spot is tracked; other replicas
+    # do the same when the change notification reaches them
+    occupancy_overlay.invalidate(zone_id)
+    await notify_worker_config_changed(zone.organization_id, zone_id)
     return spot
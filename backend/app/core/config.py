@@ -1,3 +1,4 @@
+import socket
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -5,8 +6,57 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "CHANGE_THIS_TO_A_STRONG_SECRET"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Refresh tokens trade for new access tokens without a password check;
+    # service tokens are long-lived access tokens for machine clients (AI workers)
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14
+    SERVICE_TOKEN_EXPIRE_DAYS: int = 365
+    # bcrypt runs on its own executor: "thread" or "process", how many at once,
+    # and how many logins may wait for a slot before getting 503
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_WAITING: int = 64
     DATABASE_URL: str = "postgresql://cloudpark:password@db:5432/cloudpark"
     REDIS_URL: str = "redis://redis:6379/0"
+    # Max number of parsed zone grids kept in memory per process (LRU)
+    GRID_CACHE_MAX_ZONES: int = 256
+    # How long an assigned spot stays reserved before it can be handed out again
+    SPOT_RESERVATION_TTL_SECONDS: int = 300
+    # WebSocket fan-out: per-client pending updates, max delivery lag before disconnect, send timeout
+    WS_MAX_PENDING_UPDATES: int = 1000
+    WS_LAG_BUDGET_SECONDS: float = 10.0
+    WS_SEND_TIMEOUT_SECONDS: float = 5.0
+    # Write-behind persistence of spot statuses: flush interval and rows per UPDATE
+    SPOT_WRITE_FLUSH_SECONDS: float = 1.0
+    SPOT_WRITE_MAX_BATCH: int = 1000
+    # Failed flushes retried as a batch before falling back to row by row; rows that still
+    # fail go to the dead-letter stream instead of blocking the writer
+    SPOT_WRITE_MAX_RETRIES: int = 3
+    SPOT_EVENTS_DEAD_LETTER_STREAM: str = "spot_events:dead"
+    # Spot event stream: approximate retention, and this replica's consumer name. Set
+    # INSTANCE_ID to a stable per-replica name so a restarted replica resumes from its
+    # last-seen entry; the hostname default changes with every container, so without it
+    # the replica's hub group is deleted on shutdown instead of being left orphaned
+    SPOT_EVENTS_MAXLEN: int = 100000
+    INSTANCE_ID: str = socket.gethostname()
+    # Hub groups whose consumers have all been idle this long (crashed or renamed
+    # replicas) are deleted when a replica starts
+    HUB_GROUP_MAX_IDLE_SECONDS: int = 86400
+    # Zones of the routing/assignment overlay are re-seeded from the DB and Redis this
+    # often, so missed or trimmed events (and other replicas' changes) cannot linger
+    OCCUPANCY_OVERLAY_TTL_SECONDS: float = 60.0
+    # Occupancy history: raw event retention (daily partitions), partitions created ahead,
+    # and how often the hourly rollups are refreshed
+    OCCUPANCY_EVENT_RETENTION_DAYS: int = 30
+    OCCUPANCY_PARTITION_PREMAKE_DAYS: int = 3
+    OCCUPANCY_ROLLUP_INTERVAL_SECONDS: float = 300.0
+    # How long /analytics/occupancy answers are served from Redis
+    ANALYTICS_CACHE_TTL_SECONDS: int = 5
+    # Authenticated principals (user id -> org/role) kept in memory per process; 0 disables
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    # Cameras per page of /cameras/worker-config (default, and the most a client may ask for)
+    WORKER_CONFIG_PAGE_SIZE: int = 500
+    WORKER_CONFIG_MAX_PAGE_SIZE: int = 2000
     
     class Config:
         case_sensitive = True
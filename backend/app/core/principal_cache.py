@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+from sqlalchemy import event
+from app.core.config import settings
+from app.models import User
+from app.redis_client import async_redis_client, redis_client
+
+class Principal(NamedTuple):
+    """The authenticated caller as the endpoints need it: no ORM object, no session."""
+    id: int
+    organization_id: Optional[int]
+    role: str
+
+class PrincipalCache:
+    """
+    In-process, size-bounded TTL cache of user id -> Principal, so authenticated
+    requests normally skip the users table. invalidate() drops a user eagerly (see the
+    User listeners below) and remembers when, so claims in tokens issued before the
+    change are no longer trusted. Other replicas keep their cached entry until it
+    expires; from then on claims_trusted() checks the invalidation time shared through
+    Redis, so they load the user instead of trusting its older tokens.
+    A ttl of 0 disables the cache.
+    """
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[float, Principal]]" = OrderedDict()
+        self._invalidated_at: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= now:
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, principal: Principal):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[principal.id] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def trusts_claims(self, user_id: int, issued_at: Optional[float]) -> bool:
+        """Whether a token issued at issued_at (epoch seconds) predates no invalidation of the user."""
+        if not self.enabled or issued_at is None:
+            return False
+        with self._lock:
+            invalidated_at = self._invalidated_at.get(user_id)
+        return invalidated_at is None or issued_at > invalidated_at
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._invalidated_at[user_id] = time.time()
+            # Remembering invalidations only matters for as long as tokens live
+            horizon = time.time() - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            for stale_id in [u for u, at in self._invalidated_at.items() if at < horizon]:
+                del self._invalidated_at[stale_id]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidated_at.clear()
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_MAX_ENTRIES, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+def invalidation_key(user_id: int) -> str:
+    return f"principal:{user_id}:invalidated_at"
+
+async def claims_trusted(user_id: int, issued_at: Optional[float]) -> bool:
+    """
+    Whether a token's org/role claims can be used: no invalidation of the user since
+    issued_at, on this replica or (through Redis) any other. Not trusted if Redis fails.
+    """
+    if not principal_cache.trusts_claims(user_id, issued_at):
+        return False
+    try:
+        invalidated_at = await async_redis_client.get(invalidation_key(user_id))
+    except Exception as e:
+        print(f"Could not check principal invalidation: {e}")
+        return False
+    return invalidated_at is None or issued_at > float(invalidated_at)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_user(mapper, connection, target: User):
+    principal_cache.invalidate(target.id)
+    # Shared with the other replicas, for as long as tokens issued before it live
+    try:
+        redis_client.set(invalidation_key(target.id), time.time(), ex=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    except Exception as e:
+        print(f"Could not share principal invalidation: {e}")
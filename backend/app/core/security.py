@@ -1,20 +1,35 @@
 from datetime import datetime, timedelta
-from typing import Optional, Any, Union
+from typing import Optional, Any, Dict, Union
 from jose import jwt
 from passlib.context import CryptContext
 from .config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+# "type" claim values; tokens without one are plain access tokens
+REFRESH_TOKEN_TYPE = "refresh"
+SERVICE_TOKEN_TYPE = "service"
+
+def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None, claims: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Signs a token for subject (a user id). Extra claims (e.g. "org", "role") let
+    get_current_user authorize without loading the user.
+    """
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode = {"exp": expire, "sub": str(subject)}
+        expire = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode = {**(claims or {}), "exp": expire, "iat": now, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token(subject: Union[str, Any]) -> str:
+    """A token only accepted by /auth/refresh, to obtain new access tokens."""
+    return create_access_token(
+        subject, timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS), claims={"type": REFRESH_TOKEN_TYPE}
+    )
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
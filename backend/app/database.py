@@ -1,17 +1,76 @@
-from sqlmodel import SQLModel, create_engine, Session
+from pathlib import Path
+from typing import AsyncGenerator, Optional
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "postgresql://cloudpark:password@db:5432/cloudpark"
+    # Derived from DATABASE_URL (asyncpg / aiosqlite driver) unless set
+    ASYNC_DATABASE_URL: Optional[str] = None
     REDIS_URL: str = "redis://redis:6379/0"
+    # Connection pool, per engine and per process
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
 
 settings = Settings()
 
-engine = create_engine(settings.DATABASE_URL)
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+def async_database_url(url: str) -> str:
+    """The same database, through its asyncio driver."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+def pool_options(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+# Sync engine: migrations and the background writers (which run in threads)
+engine = create_engine(settings.DATABASE_URL, **pool_options(settings.DATABASE_URL))
+
+# Async engine: request handlers, so requests wait on the database without holding a thread
+ASYNC_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(ASYNC_URL, **pool_options(ASYNC_URL))
+# Objects stay readable after commit, since responses are serialized after the handler returns
+async_session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+# The schema that SQLModel.metadata.create_all used to produce
+BASELINE_REVISION = "0001"
 
 def init_db():
-    SQLModel.metadata.create_all(engine)
+    """
+    Brings the schema up to date with the Alembic migrations.
+    Databases created before migrations existed (tables but no alembic_version)
+    are stamped at the baseline first, so only the later revisions run on them.
+    """
+    config = Config(str(ALEMBIC_INI))
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "alembic_version" not in tables and "spot" in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
 
-def get_session():
-    with Session(engine) as session:
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    async with async_session_factory() as session:
         yield session
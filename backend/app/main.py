@@ -1,12 +1,15 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from typing import List, Optional
+from fastapi import Depends, FastAPI, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from .database import init_db, engine
+from .database import init_db, engine, async_engine
 from .initial_data import init_data
 from .core.config import settings
 from sqlmodel import Session
-from app.models import Spot
+from app.persistence import spot_writer
+from app.core.hashing import password_hasher
+from app.occupancy_history import maintain_event_partitions, occupancy_rollup_job
+from app.realtime import manager, spot_updates_listener, config_change_listener, remove_hub_group, authenticate_websocket, organization_zone_ids
 from contextlib import asynccontextmanager
-import redis.asyncio as aioredis
 import asyncio
 import json
 
@@ -15,7 +18,27 @@ async def lifespan(app: FastAPI):
     init_db()
     with Session(engine) as session:
         init_data(session)
+    # Event partitions have to exist before the writer appends history
+    maintain_event_partitions()
+    # One spot event consumer per process, fanned out to every WebSocket,
+    # plus the shared write-behind persister
+    listener_task = asyncio.create_task(spot_updates_listener())
+    config_listener_task = asyncio.create_task(config_change_listener())
+    persistence_task = asyncio.create_task(spot_writer.consume(settings.INSTANCE_ID))
+    writer_task = asyncio.create_task(spot_writer.run())
+    rollup_task = asyncio.create_task(occupancy_rollup_job.run())
     yield
+    listener_task.cancel()
+    config_listener_task.cancel()
+    persistence_task.cancel()
+    rollup_task.cancel()
+    await asyncio.gather(listener_task, return_exceptions=True)
+    await remove_hub_group()
+    # Cancelling the writer flushes (and acknowledges) whatever is still pending
+    writer_task.cancel()
+    await asyncio.gather(writer_task, return_exceptions=True)
+    await async_engine.dispose()
+    password_hasher.shutdown()
 
 app = FastAPI(title="CloudPark API", version="1.0.0", lifespan=lifespan)
 
@@ -28,6 +51,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+from app.api import deps
 from app.api.v1.api import api_router
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -36,82 +60,63 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 def read_root():
     return {"message": "Welcome to CloudPark API"}
 
-def update_spot_status(spot_id: int, status: str):
-    """Updates the spot status in the database."""
-    with Session(engine) as session:
-        spot = session.get(Spot, spot_id)
-        if spot:
-            spot.status = status
-            session.add(spot)
-            session.commit()
-            print(f"Updated spot {spot_id} to {status} in DB")
-        else:
-            print(f"Spot {spot_id} not found in DB")
-
-
-# ── WebSocket: Real-time spot updates ──────────────────────────────
-class ConnectionManager:
-    """Manages active WebSocket connections."""
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: str):
-        for connection in list(self.active_connections):
-            try:
-                await connection.send_text(message)
-            except Exception:
-                self.active_connections.remove(connection)
-
-manager = ConnectionManager()
+@app.get("/ws/metrics")
+def websocket_metrics(current_user: deps.Principal = Depends(deps.get_current_admin)):
+    """Fan-out health: connections, outbound queue depth, coalesced/dropped updates."""
+    return manager.metrics()
 
 @app.websocket("/ws/spots")
-async def websocket_spot_updates(websocket: WebSocket):
+async def websocket_spot_updates(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    zone_id: List[int] = Query(default=[]),
+):
     """
-    WebSocket endpoint that subscribes to Redis 'spot_updates' channel
-    and forwards messages to the connected client in real-time.
+    WebSocket endpoint that forwards spot status events to the connected
+    client in real-time (via the shared stream consumer in lifespan).
+    Authenticate with ?token=<access token>. The client receives its organization's
+    updates, or only those of the zones given as ?zone_id=..; it can change this with
+    {"type": "subscribe", "zone_ids": [..]} (null for the whole organization).
     """
-    await manager.connect(websocket)
-    
-    # Connect to Redis pub/sub
-    r = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
-    pubsub = r.pubsub()
-    await pubsub.subscribe("spot_updates")
-    
-    async def redis_listener():
-        """Listen for Redis pub/sub messages and broadcast to WebSocket."""
-        async for message in pubsub.listen():
-            if message["type"] == "message":
-                data = message["data"]
-                await manager.broadcast(data)
-                
-                # Persist to DB
-                try:
-                    msg_json = json.loads(data)
-                    spot_id = msg_json.get("spot_id")
-                    status = msg_json.get("status")
-                    if spot_id is not None and status:
-                        await asyncio.to_thread(update_spot_status, spot_id, status)
-                except Exception as e:
-                    print(f"Error persisting spot status: {e}")
-    
-    listener_task = asyncio.create_task(redis_listener())
+    organization_id = await authenticate_websocket(token)
+    if organization_id is None:
+        await websocket.close(code=1008, reason="Could not validate credentials")
+        return
+
+    zone_ids = None
+    if zone_id:
+        allowed = await organization_zone_ids(organization_id)
+        zone_ids = set(zone_id) & allowed
+    client = await manager.connect(websocket, organization_id, zone_ids)
     
     try:
-        # Keep connection alive; listen for client messages (e.g. pings)
+        # Keep connection alive; listen for client messages (pings, subscriptions)
         while True:
             data = await websocket.receive_text()
             # Client can send "ping" to keep alive
             if data == "ping":
-                await websocket.send_text(json.dumps({"type": "pong"}))
+                client.enqueue_control(json.dumps({"type": "pong"}))
+                continue
+            try:
+                request = json.loads(data)
+            except ValueError:
+                continue
+            if isinstance(request, dict) and request.get("type") == "subscribe":
+                requested = request.get("zone_ids")
+                zone_ids = None
+                if requested is not None:
+                    try:
+                        requested = {int(z) for z in requested}
+                    except (TypeError, ValueError):
+                        continue
+                    allowed = await organization_zone_ids(organization_id)
+                    zone_ids = requested & allowed
+                manager.subscribe(client, zone_ids)
+                client.enqueue_control(json.dumps({
+                    "type": "subscribed",
+                    "zone_ids": sorted(zone_ids) if zone_ids is not None else None,
+                }))
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
-        listener_task.cancel()
-        await pubsub.unsubscribe("spot_updates")
-        await r.aclose()
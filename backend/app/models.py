@@ -2,6 +2,7 @@ from typing import List, Optional
 from datetime import datetime
 from sqlmodel import Field, SQLModel, Relationship
 from pydantic import ConfigDict
+from sqlalchemy import DateTime, Index
 
 class Organization(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -19,15 +20,20 @@ class User(SQLModel, table=True):
     hashed_password: str
     full_name: Optional[str] = None
     role: str = Field(default="user") # admin, guard, driver
-    organization_id: Optional[int] = Field(default=None, foreign_key="organization.id")
+    organization_id: Optional[int] = Field(default=None, foreign_key="organization.id", index=True)
     
     organization: Optional[Organization] = Relationship(back_populates="users")
 
 class Zone(SQLModel, table=True):
+    # Per-org listings and the org's zone ids for analytics
+    __table_args__ = (Index("ix_zone_organization_id_id", "organization_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     total_spots: int
     map_grid_data: Optional[str] = None # JSON string representing the grid
+    # Bumped on every map_grid_data change; parsed grids are cached per version
+    grid_version: int = Field(default=0)
     organization_id: int = Field(foreign_key="organization.id")
     
     organization: Organization = Relationship(back_populates="zones")
@@ -35,9 +41,14 @@ class Zone(SQLModel, table=True):
     camera: Optional["Camera"] = Relationship(back_populates="zone")
 
 class Spot(SQLModel, table=True):
+    # Spots of a zone, and spots of a zone in a given status (free lookups, occupancy counts)
+    __table_args__ = (Index("ix_spot_zone_id_status", "zone_id", "status"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str # e.g. A-01
     status: str = Field(default="free") # free, occupied, reserved
+    # Stream time of the event that set status; older events never overwrite it
+    status_updated_at: Optional[datetime] = Field(default=None, sa_type=DateTime(timezone=True))
     x1: int
     y1: int
     x2: int
@@ -54,13 +65,43 @@ class Log(SQLModel, table=True):
     image_url: Optional[str] = None
     spot_id: Optional[int] = Field(default=None, foreign_key="spot.id")
 
+class OccupancyEvent(SQLModel, table=True):
+    """
+    Append-only history of spot status transitions. On PostgreSQL the table is
+    range-partitioned by day on ts (see app.occupancy_history).
+    """
+    __tablename__ = "occupancy_event"
+    __table_args__ = {"postgresql_partition_by": "RANGE (ts)"}
+
+    # The partition key has to be part of the primary key; one transition per spot per instant
+    spot_id: int = Field(foreign_key="spot.id", primary_key=True)
+    ts: datetime = Field(sa_type=DateTime(timezone=True), primary_key=True, index=True)
+    status: str
+
+class OccupancyRollup(SQLModel, table=True):
+    """Per-zone, per-hour occupancy aggregates materialised from OccupancyEvent."""
+    __tablename__ = "occupancy_rollup"
+    __table_args__ = (Index("ix_occupancy_rollup_organization_id_bucket", "organization_id", "bucket"),)
+
+    zone_id: int = Field(foreign_key="zone.id", primary_key=True)
+    bucket: datetime = Field(sa_type=DateTime(timezone=True), primary_key=True, index=True) # start of the hour (UTC)
+    organization_id: int = Field(foreign_key="organization.id")
+    spot_count: int = 0
+    occupied_seconds: float = 0.0 # sum over spots of time spent occupied
+    capacity_seconds: float = 0.0 # spot_count * observed seconds of the hour
+    arrivals: int = 0
+    departures: int = 0
+    dwell_seconds: float = 0.0 # total stay length of the departures in this hour
+
 class Camera(SQLModel, table=True):
+    __table_args__ = (Index("ix_camera_organization_id_id", "organization_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     rtsp_url: str
     type: str = Field(default="parking") # parking, portal
     organization_id: int = Field(foreign_key="organization.id")
-    zone_id: Optional[int] = Field(default=None, foreign_key="zone.id")
+    zone_id: Optional[int] = Field(default=None, foreign_key="zone.id", index=True)
     
     organization: Organization = Relationship(back_populates="cameras")
     zone: Optional[Zone] = Relationship(back_populates="camera")
@@ -0,0 +1,232 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import delete, func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+from app.core.config import settings
+from app.database import engine
+from app.models import OccupancyEvent, OccupancyRollup, Spot, Zone
+from app.redis_client import async_redis_client
+
+HOUR = timedelta(hours=1)
+ROLLUP_LOCK_KEY = "occupancy_rollup:lock"
+PARTITION_PREFIX = "occupancy_event_"
+# Spot ids per IN list when looking up statuses before a rollup window
+ROLLUP_SPOT_CHUNK = 500
+
+def as_utc(ts: datetime) -> datetime:
+    # Backends without time zone support (SQLite) hand back naive UTC values
+    return ts if ts.tzinfo is not None else ts.replace(tzinfo=timezone.utc)
+
+def hour_floor(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+def insert_occupancy_events(session: Session, events: List[Tuple[int, str, datetime]]):
+    """
+    Appends (spot_id, status, ts) transitions. Re-delivered stream entries carry the
+    same timestamp, so duplicates are skipped on the primary key. Events of spots that
+    do not exist (e.g. deleted, or a bogus id on the stream) are dropped, since they
+    would fail the spot foreign key for the whole batch.
+    """
+    if not events:
+        return
+    known = set(session.exec(select(Spot.id).where(Spot.id.in_({spot_id for spot_id, _, _ in events}))).all())
+    unknown = [event for event in events if event[0] not in known]
+    if unknown:
+        print(f"Dropping {len(unknown)} occupancy event(s) of unknown spots {sorted({e[0] for e in unknown})}")
+        events = [event for event in events if event[0] in known]
+        if not events:
+            return
+    table = OccupancyEvent.__table__
+    dialect_insert = postgresql.insert if engine.dialect.name == "postgresql" else sqlite.insert
+    statement = dialect_insert(table).on_conflict_do_nothing(index_elements=["spot_id", "ts"])
+    session.execute(statement, [{"spot_id": spot_id, "status": status, "ts": ts} for spot_id, status, ts in events])
+
+def maintain_event_partitions(now: Optional[datetime] = None):
+    """
+    PostgreSQL only: creates the daily occupancy_event partitions from yesterday to
+    OCCUPANCY_PARTITION_PREMAKE_DAYS ahead and drops those past the retention window.
+    Events outside every daily partition (e.g. replayed after a long outage) land in a
+    DEFAULT partition instead of failing; when a daily partition is later created for
+    such a day, its rows are moved out of the default first. Rollups are kept; only raw
+    events expire.
+    """
+    if engine.dialect.name != "postgresql":
+        return
+    today = (now or datetime.now(timezone.utc)).date()
+    cutoff = today - timedelta(days=settings.OCCUPANCY_EVENT_RETENTION_DAYS)
+    default_partition = f"{PARTITION_PREFIX}default"
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default_partition} PARTITION OF occupancy_event DEFAULT"))
+        for offset in range(-1, settings.OCCUPANCY_PARTITION_PREMAKE_DAYS + 1):
+            day = today + timedelta(days=offset)
+            name = f"{PARTITION_PREFIX}{day:%Y%m%d}"
+            if day < cutoff or conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+                continue
+            # Attaching fails while the default partition holds rows of the range, so they move first
+            bounds = {"start": day.isoformat(), "end": (day + timedelta(days=1)).isoformat()}
+            conn.execute(text(f"CREATE TABLE {name} (LIKE occupancy_event INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+            conn.execute(text(
+                f"WITH moved AS (DELETE FROM {default_partition} WHERE ts >= :start AND ts < :end "
+                f"RETURNING spot_id, ts, status) INSERT INTO {name} (spot_id, ts, status) SELECT spot_id, ts, status FROM moved"
+            ), bounds)
+            conn.execute(text(
+                f"ALTER TABLE occupancy_event ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+            ))
+        conn.execute(text(f"DELETE FROM {default_partition} WHERE ts < :cutoff"), {"cutoff": cutoff.isoformat()})
+        partitions = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'occupancy_event'"
+        )).scalars().all()
+        for name in partitions:
+            try:
+                day = datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+            except ValueError:
+                continue
+            if day < cutoff:
+                conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+
+def compute_rollups(session: Session, start: datetime, end: datetime) -> List[OccupancyRollup]:
+    """
+    Builds the hourly rollups of [start, end) (hour aligned; the last hour may be partial)
+    from the transitions in the window plus each spot's last status before it.
+    Spots without any recorded transition count as free.
+    """
+    spots = session.exec(
+        select(Spot.id, Spot.zone_id, Zone.organization_id, Spot.status, Spot.status_updated_at)
+        .join(Zone, Zone.id == Spot.zone_id)
+    ).all()
+    # A spot whose persisted status comes from an event before the window was in that
+    # status at its start; only the others (active since, or not stamped yet) are looked
+    # up, with a single index probe each for their last event before the window
+    initial: Dict[int, Tuple[Optional[str], Optional[datetime]]] = {}
+    active = []
+    for spot_id, _, _, status, status_ts in spots:
+        if status_ts is not None and as_utc(status_ts) < start:
+            initial[spot_id] = (status, status_ts)
+        else:
+            active.append(spot_id)
+    last_ts = (
+        select(OccupancyEvent.ts)
+        .where(OccupancyEvent.spot_id == Spot.id, OccupancyEvent.ts < start)
+        .order_by(OccupancyEvent.ts.desc())
+        .limit(1)
+        .correlate(Spot)
+        .scalar_subquery()
+    )
+    for chunk_start in range(0, len(active), ROLLUP_SPOT_CHUNK):
+        for spot_id, status, ts in session.exec(
+            select(Spot.id, OccupancyEvent.status, OccupancyEvent.ts)
+            .join(OccupancyEvent, (OccupancyEvent.spot_id == Spot.id) & (OccupancyEvent.ts == last_ts))
+            .where(Spot.id.in_(active[chunk_start:chunk_start + ROLLUP_SPOT_CHUNK]))
+        ):
+            initial[spot_id] = (status, ts)
+
+    events: Dict[int, List[Tuple[str, datetime]]] = defaultdict(list)
+    for spot_id, status, ts in session.exec(
+        select(OccupancyEvent.spot_id, OccupancyEvent.status, OccupancyEvent.ts)
+        .where(OccupancyEvent.ts >= start, OccupancyEvent.ts < end)
+        .order_by(OccupancyEvent.spot_id, OccupancyEvent.ts)
+    ):
+        events[spot_id].append((status, as_utc(ts)))
+
+    rollups: Dict[Tuple[int, datetime], OccupancyRollup] = {}
+    zone_spots: Dict[int, int] = defaultdict(int)
+
+    def rollup_at(zone_id: int, organization_id: int, ts: datetime) -> OccupancyRollup:
+        bucket = hour_floor(ts)
+        key = (zone_id, bucket)
+        if key not in rollups:
+            rollups[key] = OccupancyRollup(zone_id=zone_id, bucket=bucket, organization_id=organization_id)
+        return rollups[key]
+
+    def add_occupied(zone_id: int, organization_id: int, since: datetime, until: datetime):
+        # Split an occupied interval over the hour buckets it spans
+        while since < until:
+            bucket_end = min(hour_floor(since) + HOUR, until)
+            rollup_at(zone_id, organization_id, since).occupied_seconds += (bucket_end - since).total_seconds()
+            since = bucket_end
+
+    for spot_id, zone_id, organization_id, _, _ in spots:
+        zone_spots[zone_id] += 1
+        status, status_ts = initial.get(spot_id, (None, None))
+        occupied_since = as_utc(status_ts) if status == "occupied" else None
+        cursor = start
+        for new_status, ts in events.get(spot_id, []):
+            if occupied_since is not None:
+                add_occupied(zone_id, organization_id, max(cursor, start), ts)
+                if new_status != "occupied":
+                    rollup = rollup_at(zone_id, organization_id, ts)
+                    rollup.departures += 1
+                    rollup.dwell_seconds += (ts - occupied_since).total_seconds()
+                    occupied_since = None
+            elif new_status == "occupied":
+                rollup_at(zone_id, organization_id, ts).arrivals += 1
+                occupied_since = ts
+            cursor = ts
+        if occupied_since is not None:
+            add_occupied(zone_id, organization_id, max(cursor, start), end)
+
+        # Every hour of the window gets a row, even without activity
+        bucket = start
+        while bucket < end:
+            rollup_at(zone_id, organization_id, bucket)
+            bucket += HOUR
+
+    for (zone_id, bucket), rollup in rollups.items():
+        rollup.spot_count = zone_spots[zone_id]
+        rollup.capacity_seconds = rollup.spot_count * (min(bucket + HOUR, end) - bucket).total_seconds()
+    return list(rollups.values())
+
+def refresh_rollups(now: Optional[datetime] = None):
+    """
+    Recomputes the rollups from the previous hour up to now (late events land there),
+    or, on a fresh database, from the first recorded event, one day at a time.
+    """
+    now = now or datetime.now(timezone.utc)
+    current_hour = hour_floor(now)
+    with Session(engine) as session:
+        last_bucket = session.exec(select(func.max(OccupancyRollup.bucket))).one()
+        if last_bucket is None:
+            first_event = session.exec(select(func.min(OccupancyEvent.ts))).one()
+            if first_event is None:
+                return
+            last_bucket = hour_floor(first_event)
+        start = min(as_utc(last_bucket), current_hour - HOUR)
+        while start < now:
+            end = min(start + timedelta(days=1), now)
+            rollups = compute_rollups(session, start, end)
+            session.execute(delete(OccupancyRollup).where(OccupancyRollup.bucket >= start, OccupancyRollup.bucket < end))
+            session.add_all(rollups)
+            session.commit()
+            start = end
+
+class OccupancyRollupJob:
+    """
+    Periodically materialises the hourly rollups and maintains the event partitions.
+    A short Redis lock keeps replicas from doing the same work concurrently.
+    """
+    async def run_once(self):
+        acquired = await async_redis_client.set(
+            ROLLUP_LOCK_KEY, settings.INSTANCE_ID, nx=True, ex=max(1, int(settings.OCCUPANCY_ROLLUP_INTERVAL_SECONDS))
+        )
+        if not acquired:
+            return
+        await asyncio.to_thread(maintain_event_partitions)
+        await asyncio.to_thread(refresh_rollups)
+
+    async def run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error refreshing occupancy rollups: {e}")
+            await asyncio.sleep(settings.OCCUPANCY_ROLLUP_INTERVAL_SECONDS)
+
+occupancy_rollup_job = OccupancyRollupJob()
@@ -0,0 +1,212 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import DateTime, Integer, String, bindparam, column, or_, text, update, values
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import Session
+from app.core.config import settings
+from app.database import engine
+from app.models import Spot
+from app.occupancy_history import insert_occupancy_events
+from app.redis_client import async_redis_client, parse_spot_message
+from app import spot_events
+
+# One group shared by all backend replicas: each event is persisted by exactly one of them
+PERSISTENCE_GROUP = "persistence"
+
+def bulk_update_spot_statuses(items: List[Tuple[int, str, datetime]], events: List[Tuple[int, str, datetime]] = ()):
+    """
+    Writes many (spot_id, status, ts) in one statement per chunk:
+    UPDATE spot SET status = v.status, status_updated_at = v.ts FROM (VALUES ...) AS v (id, status, ts)
+    WHERE ... AND spot.status_updated_at < v.ts. Replicas flush independently, so a status
+    from an older event than the persisted one is skipped. Other dialects fall back to
+    executemany with the same guard.
+    The (spot_id, status, ts) transitions are appended to the occupancy history in the
+    same transaction.
+    """
+    table = Spot.__table__
+    with Session(engine) as session:
+        insert_occupancy_events(session, list(events))
+        for start in range(0, len(items), settings.SPOT_WRITE_MAX_BATCH):
+            chunk = items[start:start + settings.SPOT_WRITE_MAX_BATCH]
+            if engine.dialect.name == "postgresql":
+                rows = values(
+                    column("id", Integer), column("status", String), column("ts", DateTime(timezone=True)), name="v"
+                ).data(chunk)
+                statement = (
+                    update(Spot)
+                    .where(Spot.id == rows.c.id, newer_than_persisted(rows.c.ts))
+                    .values(status=rows.c.status, status_updated_at=rows.c.ts)
+                    .execution_options(synchronize_session=False)
+                )
+                session.execute(statement)
+            else:
+                # Core table update, so the parameter list runs as a plain executemany
+                statement = (
+                    update(table)
+                    .where(table.c.id == bindparam("spot_id"), newer_than_persisted(bindparam("ts")))
+                    .values(status=bindparam("new_status"), status_updated_at=bindparam("ts"))
+                )
+                session.execute(
+                    statement, [{"spot_id": spot_id, "new_status": status, "ts": ts} for spot_id, status, ts in chunk]
+                )
+        session.commit()
+
+def newer_than_persisted(ts):
+    """Guard for status writes: the row has no event time yet, or an older one."""
+    status_updated_at = Spot.__table__.c.status_updated_at
+    return or_(status_updated_at.is_(None), status_updated_at < ts)
+
+def persist_spot_statuses_individually(items: List[Tuple[int, str, datetime]], events: List[Tuple[int, str, datetime]]) -> list:
+    """
+    Fallback for a batch that keeps failing: every status and event is written in its own
+    savepoint, so one bad row cannot hold back the others. Returns the rows that failed,
+    as (kind, row, error).
+    """
+    failed = []
+    table = Spot.__table__
+    with Session(engine) as session:
+        # An unreachable database raises here, not per row, so nothing is dead-lettered for it
+        session.execute(text("SELECT 1"))
+        for spot_id, status, ts in items:
+            try:
+                with session.begin_nested():
+                    session.execute(
+                        update(table)
+                        .where(table.c.id == spot_id, newer_than_persisted(ts))
+                        .values(status=status, status_updated_at=ts)
+                    )
+            except DBAPIError as e:
+                if e.connection_invalidated:
+                    raise
+                failed.append(("status", (spot_id, status, ts), str(e)))
+        for event in events:
+            try:
+                with session.begin_nested():
+                    insert_occupancy_events(session, [event])
+            except DBAPIError as e:
+                if e.connection_invalidated:
+                    raise
+                failed.append(("event", event, str(e)))
+        session.commit()
+    return failed
+
+def pending_rows(batch: Dict[int, Tuple[str, datetime]]) -> List[Tuple[int, str, datetime]]:
+    return [(spot_id, status, ts) for spot_id, (status, ts) in batch.items()]
+
+class SpotStatusWriter:
+    """
+    Write-behind persister for spot statuses. Updates from the stream are coalesced
+    per spot (latest entry wins) and flushed every SPOT_WRITE_FLUSH_SECONDS as bulk UPDATEs,
+    independently of how many WebSocket clients are connected.
+    Stream entries are acknowledged only once their statuses are committed, so a crash
+    before a flush means they are re-delivered rather than lost.
+    Every transition (not just the latest) is also kept for the occupancy history.
+    A batch failing SPOT_WRITE_MAX_RETRIES flushes in a row is written row by row, and
+    rows that still fail are dead-lettered, so a poison row cannot stall persistence.
+    """
+    def __init__(self):
+        self._pending: Dict[int, Tuple[str, datetime]] = {}  # spot_id -> (status, entry time)
+        self._events: List[Tuple[int, str, datetime]] = []
+        self._pending_entry_ids: List[str] = []
+        self.flushed = 0
+        self.coalesced = 0
+        self.failed_flushes = 0
+        self.dead_lettered = 0
+
+    def submit(self, updates: List[Tuple[int, str]], entry_id: Optional[str] = None):
+        # Events are stamped with the stream entry time, so re-deliveries are recognisable
+        ts = spot_events.entry_time(entry_id) if entry_id is not None else datetime.now(timezone.utc)
+        for spot_id, status in updates:
+            if spot_id in self._pending:
+                self.coalesced += 1
+            # A re-delivered or claimed entry can be older than the one already pending
+            if spot_id not in self._pending or self._pending[spot_id][1] <= ts:
+                self._pending[spot_id] = (status, ts)
+            self._events.append((spot_id, status, ts))
+        if entry_id is not None:
+            self._pending_entry_ids.append(entry_id)
+
+    async def flush(self):
+        if not self._pending and not self._pending_entry_ids:
+            return
+        batch, self._pending = self._pending, {}
+        events, self._events = self._events, []
+        entry_ids, self._pending_entry_ids = self._pending_entry_ids, []
+        try:
+            if batch:
+                await asyncio.to_thread(bulk_update_spot_statuses, pending_rows(batch), events)
+            self.flushed += len(batch)
+            self.failed_flushes = 0
+        except Exception as e:
+            print(f"Error persisting {len(batch)} spot statuses: {e}")
+            self.failed_flushes += 1
+            if self.failed_flushes < settings.SPOT_WRITE_MAX_RETRIES:
+                self._requeue(batch)
+                self._events[:0] = events
+                self._pending_entry_ids[:0] = entry_ids
+                return
+            if not await self._persist_individually(batch, events):
+                # Not even row by row (e.g. the database is down): keep everything for later
+                self._requeue(batch)
+                self._events[:0] = events
+                self._pending_entry_ids[:0] = entry_ids
+                return
+            self.failed_flushes = 0
+        try:
+            await spot_events.ack(PERSISTENCE_GROUP, entry_ids)
+        except Exception as e:
+            # Unacked entries are re-delivered and re-applied; the UPDATE is idempotent
+            print(f"Error acknowledging persisted spot events: {e}")
+
+    def _requeue(self, batch: Dict[int, Tuple[str, datetime]]):
+        """Puts a failed batch back, unless newer statuses arrived meanwhile."""
+        for spot_id, (status, ts) in batch.items():
+            if spot_id not in self._pending or self._pending[spot_id][1] < ts:
+                self._pending[spot_id] = (status, ts)
+
+    async def _persist_individually(self, batch: Dict[int, Tuple[str, datetime]], events: List[Tuple[int, str, datetime]]) -> bool:
+        """Row-by-row fallback; dead-letters the rows that fail. False if it could not run at all."""
+        try:
+            failed = await asyncio.to_thread(persist_spot_statuses_individually, pending_rows(batch), events)
+        except Exception as e:
+            print(f"Error persisting spot statuses row by row: {e}")
+            return False
+        self.flushed += len(batch) - sum(1 for kind, _, _ in failed if kind == "status")
+        if failed:
+            self.dead_lettered += len(failed)
+            print(f"Dead-lettering {len(failed)} spot status row(s) that could not be persisted")
+            try:
+                for kind, row, error in failed:
+                    await async_redis_client.xadd(
+                        settings.SPOT_EVENTS_DEAD_LETTER_STREAM,
+                        {"data": json.dumps({"kind": kind, "row": row, "error": error}, default=str)},
+                        maxlen=settings.SPOT_EVENTS_MAXLEN,
+                        approximate=True,
+                    )
+            except Exception as e:
+                print(f"Error writing dead-lettered spot statuses: {e}")
+        return True
+
+    async def consume(self, consumer: str):
+        """Feeds the writer from the shared persistence consumer group."""
+        async def handle(entries):
+            for entry_id, fields in entries:
+                try:
+                    _, _, updates = parse_spot_message(fields["data"])
+                except Exception as e:
+                    print(f"Invalid spot event {entry_id}: {e}")
+                    updates = []
+                self.submit(updates, entry_id)
+        await spot_events.consume_spot_events(PERSISTENCE_GROUP, consumer, handle, claim_abandoned=True)
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(settings.SPOT_WRITE_FLUSH_SECONDS)
+                await self.flush()
+        finally:
+            await self.flush()
+
+spot_writer = SpotStatusWriter()
@@ -0,0 +1,304 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import WebSocket
+from sqlmodel import select
+from app.api import deps
+from app.core.config import settings
+from app.database import async_session_factory
+from app.models import Spot, Zone
+from app.algorithms.occupancy import occupancy_overlay
+from app.redis_client import async_redis_client, parse_spot_message, SPOT_EVENTS_STREAM, WORKER_CONFIG_CHANNEL
+from app import spot_events
+
+async def organization_zone_ids(organization_id: int) -> Set[int]:
+    async with async_session_factory() as session:
+        return set((await session.exec(select(Zone.id).where(Zone.organization_id == organization_id))).all())
+
+async def authenticate_websocket(token: Optional[str]) -> Optional[int]:
+    """Returns the organization id of the token's user, or None if the token is not valid."""
+    if not token:
+        return None
+    async with async_session_factory() as session:
+        try:
+            principal = await deps.get_principal_from_token(session, token)
+        except Exception:
+            return None
+        return principal.organization_id
+
+class SpotDirectory:
+    """spot id -> (organization_id, zone_id), for messages published without routing ids."""
+    def __init__(self):
+        self._locations: Dict[int, Tuple[int, int]] = {}
+
+    async def resolve(self, spot_ids: Iterable[int]) -> Dict[int, Tuple[int, int]]:
+        spot_ids = list(spot_ids)
+        missing = [spot_id for spot_id in spot_ids if spot_id not in self._locations]
+        if missing:
+            async with async_session_factory() as session:
+                rows = (await session.exec(
+                    select(Spot.id, Zone.organization_id, Spot.zone_id).join(Zone).where(Spot.id.in_(missing))
+                )).all()
+            for spot_id, organization_id, zone_id in rows:
+                self._locations[spot_id] = (organization_id, zone_id)
+        return {spot_id: self._locations[spot_id] for spot_id in spot_ids if spot_id in self._locations}
+
+spot_directory = SpotDirectory()
+
+
+# ── WebSocket: Real-time spot updates ──────────────────────────────
+class ClientConnection:
+    """
+    One WebSocket client with its own outbound buffer and sender task, so a slow
+    client only delays itself. Pending spot updates are coalesced (latest status
+    per spot wins) and bounded by WS_MAX_PENDING_UPDATES (oldest dropped first).
+    A client sees its organization's updates, optionally narrowed to some zones.
+    """
+    def __init__(self, websocket: WebSocket, organization_id: int):
+        self.websocket = websocket
+        self.organization_id = organization_id
+        self.zone_ids: Optional[Set[int]] = None  # None = every zone of the organization
+        self.pending: "OrderedDict[int, str]" = OrderedDict()
+        self.control: deque = deque()  # non-coalescable messages, e.g. pongs
+        self.oldest_pending_at: Optional[float] = None
+        self.wakeup = asyncio.Event()
+        self.sender_task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def queue_depth(self) -> int:
+        return len(self.pending) + len(self.control)
+
+    def lag(self) -> float:
+        """Seconds the oldest undelivered update has been waiting."""
+        if self.oldest_pending_at is None:
+            return 0.0
+        return time.monotonic() - self.oldest_pending_at
+
+    def enqueue_updates(self, updates: List[Tuple[int, str]]):
+        for spot_id, status in updates:
+            if spot_id in self.pending:
+                self.coalesced += 1
+            elif len(self.pending) >= settings.WS_MAX_PENDING_UPDATES:
+                self.pending.popitem(last=False)
+                self.dropped += 1
+            self.pending[spot_id] = status
+        if self.pending and self.oldest_pending_at is None:
+            self.oldest_pending_at = time.monotonic()
+        self.wakeup.set()
+
+    def enqueue_control(self, message: str):
+        self.control.append(message)
+        self.wakeup.set()
+
+    async def run_sender(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.control:
+                await asyncio.wait_for(self.websocket.send_text(self.control.popleft()), settings.WS_SEND_TIMEOUT_SECONDS)
+            if self.pending:
+                batch, self.pending = self.pending, OrderedDict()
+                self.oldest_pending_at = None
+                message = json.dumps({"updates": [{"spot_id": spot_id, "status": status} for spot_id, status in batch.items()]})
+                await asyncio.wait_for(self.websocket.send_text(message), settings.WS_SEND_TIMEOUT_SECONDS)
+                self.sent += len(batch)
+
+class ConnectionManager:
+    """
+    Manages active WebSocket connections (the in-process fan-out hub).
+    Clients are indexed by organization (whole-org subscriptions) and by zone, so an
+    update is only serialized and queued for clients that actually view its zone.
+    """
+    def __init__(self):
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self._org_subscribers: Dict[int, Set[ClientConnection]] = {}
+        self._zone_subscribers: Dict[int, Set[ClientConnection]] = {}
+        self.slow_disconnects = 0
+        self.dropped = 0  # totals from clients that already left
+        self.coalesced = 0
+
+    async def connect(self, websocket: WebSocket, organization_id: int, zone_ids: Optional[Set[int]] = None) -> ClientConnection:
+        await websocket.accept()
+        client = ClientConnection(websocket, organization_id)
+        client.sender_task = asyncio.create_task(self._run_client(client))
+        self.clients[websocket] = client
+        self.subscribe(client, zone_ids)
+        return client
+
+    def _unindex(self, client: ClientConnection):
+        self._org_subscribers.get(client.organization_id, set()).discard(client)
+        for zone_id in client.zone_ids or ():
+            self._zone_subscribers.get(zone_id, set()).discard(client)
+
+    def subscribe(self, client: ClientConnection, zone_ids: Optional[Set[int]]):
+        """Switches a client to the given zones of its organization (None = all of them)."""
+        self._unindex(client)
+        client.zone_ids = zone_ids
+        if zone_ids is None:
+            self._org_subscribers.setdefault(client.organization_id, set()).add(client)
+        else:
+            for zone_id in zone_ids:
+                self._zone_subscribers.setdefault(zone_id, set()).add(client)
+
+    async def _run_client(self, client: ClientConnection):
+        try:
+            await client.run_sender()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Send failed or timed out: treat the client as gone
+            self.disconnect(client.websocket)
+            await self._close(client.websocket)
+
+    async def _close(self, websocket: WebSocket, code: int = 1000, reason: str = ""):
+        try:
+            await asyncio.wait_for(websocket.close(code=code, reason=reason), settings.WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        self._unindex(client)
+        self.dropped += client.dropped
+        self.coalesced += client.coalesced
+        if client.sender_task and client.sender_task is not asyncio.current_task():
+            client.sender_task.cancel()
+
+    def broadcast(self, updates: List[Tuple[int, str]], organization_id: int, zone_id: int):
+        """Queues one zone's updates for its subscribers without awaiting any socket."""
+        targets = self._org_subscribers.get(organization_id, set()) | self._zone_subscribers.get(zone_id, set())
+        for client in targets:
+            websocket = client.websocket
+            if client.lag() > settings.WS_LAG_BUDGET_SECONDS:
+                print(f"Disconnecting WebSocket client lagging {client.lag():.1f}s behind")
+                self.slow_disconnects += 1
+                self.disconnect(websocket)
+                asyncio.create_task(self._close(websocket, code=1013, reason="Client too slow"))
+                continue
+            client.enqueue_updates(updates)
+
+    def metrics(self) -> dict:
+        depths = [client.queue_depth() for client in self.clients.values()]
+        return {
+            "connections": len(self.clients),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "max_lag_seconds": max((client.lag() for client in self.clients.values()), default=0.0),
+            "coalesced": self.coalesced + sum(client.coalesced for client in self.clients.values()),
+            "dropped": self.dropped + sum(client.dropped for client in self.clients.values()),
+            "slow_disconnects": self.slow_disconnects,
+        }
+
+manager = ConnectionManager()
+
+async def handle_spot_update(data: str):
+    """Applies one spot event to this replica: routing overlay and WebSocket clients."""
+    try:
+        organization_id, zone_id, updates = parse_spot_message(data)
+    except Exception as e:
+        print(f"Invalid spot update message: {e}")
+        return
+
+    for spot_id, status in updates:
+        occupancy_overlay.apply(spot_id, status)
+
+    # Route by zone; messages without routing ids are grouped via the spot directory
+    if organization_id is not None and zone_id is not None:
+        groups = {(organization_id, zone_id): updates}
+    else:
+        locations = await spot_directory.resolve([spot_id for spot_id, _ in updates])
+        groups = {}
+        for spot_id, status in updates:
+            if spot_id in locations:
+                groups.setdefault(locations[spot_id], []).append((spot_id, status))
+    for (organization_id, zone_id), zone_updates in groups.items():
+        manager.broadcast(zone_updates, organization_id, zone_id)
+
+HUB_GROUP_PREFIX = "hub:"
+
+def hub_group() -> str:
+    return f"{HUB_GROUP_PREFIX}{settings.INSTANCE_ID}"
+
+def instance_id_is_stable() -> bool:
+    """Whether INSTANCE_ID was configured, rather than defaulting to the (per-container) hostname."""
+    return "INSTANCE_ID" in settings.model_fields_set
+
+async def prune_hub_groups():
+    """
+    Deletes the hub groups of other replicas whose consumers have all been idle for
+    HUB_GROUP_MAX_IDLE_SECONDS (crashed before removing their group, or renamed),
+    so they stop pinning stream entries and cluttering XINFO.
+    """
+    max_idle_ms = settings.HUB_GROUP_MAX_IDLE_SECONDS * 1000
+    # On a fresh deployment the stream (and so any group) does not exist yet
+    if not await async_redis_client.exists(SPOT_EVENTS_STREAM):
+        return
+    for info in await async_redis_client.xinfo_groups(SPOT_EVENTS_STREAM):
+        name = info["name"]
+        if not name.startswith(HUB_GROUP_PREFIX) or name == hub_group():
+            continue
+        consumers = await async_redis_client.xinfo_consumers(SPOT_EVENTS_STREAM, name)
+        # A group without consumers may belong to a replica that is just starting
+        if consumers and all(consumer["idle"] >= max_idle_ms for consumer in consumers):
+            print(f"Deleting idle hub consumer group {name}")
+            await async_redis_client.xgroup_destroy(SPOT_EVENTS_STREAM, name)
+
+async def remove_hub_group():
+    """On shutdown: a group named after a throwaway hostname would never be read again."""
+    if instance_id_is_stable():
+        return
+    try:
+        await async_redis_client.xgroup_destroy(SPOT_EVENTS_STREAM, hub_group())
+    except Exception as e:
+        print(f"Could not delete hub consumer group: {e}")
+
+async def spot_updates_listener():
+    """
+    The process-wide spot event consumer for the WebSocket hub, started once in lifespan.
+    Each replica has its own consumer group, so every replica sees every event, and a
+    restarted replica (with a stable INSTANCE_ID) catches up from its last acknowledged entry.
+    """
+    group = hub_group()
+    try:
+        await prune_hub_groups()
+    except Exception as e:
+        print(f"Could not prune hub consumer groups: {e}")
+
+    async def handle(entries):
+        for entry_id, fields in entries:
+            await handle_spot_update(fields.get("data", "{}"))
+        await spot_events.ack(group, [entry_id for entry_id, _ in entries])
+
+    # Entries may have been missed while reads failed: re-seed the overlay from scratch
+    await spot_events.consume_spot_events(group, settings.INSTANCE_ID, handle, on_reconnect=occupancy_overlay.clear)
+
+async def config_change_listener():
+    """
+    Re-seeds this replica's occupancy overlay for zones whose spots changed on any replica
+    (started once in lifespan). Missed notifications are covered by the overlay's seed TTL.
+    """
+    while True:
+        try:
+            pubsub = async_redis_client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(WORKER_CONFIG_CHANNEL)
+            try:
+                async for message in pubsub.listen():
+                    try:
+                        zone_id = json.loads(message["data"]).get("zone_id")
+                    except (ValueError, TypeError, AttributeError):
+                        continue
+                    if zone_id is not None:
+                        occupancy_overlay.invalidate(int(zone_id))
+            finally:
+                await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Config change listener failed: {e}. Retrying...")
+            await asyncio.sleep(1)
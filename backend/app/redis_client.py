@@ -0,0 +1,88 @@
+import json
+import time
+from typing import List, Optional, Tuple
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+
+# Shared clients; redis-py pools connections and connects lazily on first command.
+redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+async_redis_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# Durable stream of spot status transitions (AI worker + backend reservations).
+# Entries have a single 'data' field holding a spot_message() JSON payload.
+SPOT_EVENTS_STREAM = "spot_events"
+
+def parse_spot_message(data: str) -> Tuple[Optional[int], Optional[int], List[Tuple[int, str]]]:
+    """
+    Decodes a spot event payload into (organization_id, zone_id, [(spot_id, status), ...]).
+    The AI worker publishes one batched {"organization_id", "zone_id", "updates": [...]}
+    message per camera tick; the backend publishes single {"spot_id", "status"} messages
+    (e.g. reservations). Org/zone ids are None when the publisher did not include them.
+    """
+    msg_json = json.loads(data)
+    items = msg_json.get("updates", [msg_json])
+    updates = [
+        (int(item["spot_id"]), item["status"])
+        for item in items
+        if item.get("spot_id") is not None and item.get("status")
+    ]
+    return msg_json.get("organization_id"), msg_json.get("zone_id"), updates
+
+def spot_message(updates: List[Tuple[int, str]], organization_id: Optional[int] = None, zone_id: Optional[int] = None) -> str:
+    """Encodes updates in the batched spot event format."""
+    return json.dumps({
+        "organization_id": organization_id,
+        "zone_id": zone_id,
+        "updates": [{"spot_id": spot_id, "status": status} for spot_id, status in updates],
+    })
+
+async def append_spot_event(updates: List[Tuple[int, str]], organization_id: Optional[int] = None, zone_id: Optional[int] = None) -> str:
+    """Appends a spot event to the stream; returns the entry id."""
+    return await async_redis_client.xadd(
+        SPOT_EVENTS_STREAM,
+        {"data": spot_message(updates, organization_id, zone_id)},
+        maxlen=settings.SPOT_EVENTS_MAXLEN,
+        approximate=True,
+    )
+
+# Pub/sub channel announcing camera/spot configuration changes: AI workers re-fetch their
+# configuration, backend replicas re-seed the zone's occupancy overlay.
+# Payload: {"organization_id": .., "zone_id": .. or null}
+WORKER_CONFIG_CHANNEL = "worker_config"
+
+def worker_config_version_key(organization_id: int) -> str:
+    return f"worker_config:{organization_id}:version"
+
+async def get_worker_config_version(organization_id: int) -> Optional[str]:
+    """
+    Opaque version of an organization's camera/spot configuration, bumped on every change
+    (the ETag of /cameras/worker-config). A lost key restarts from the current time in ns,
+    above any value handed out before, so a stale ETag can never match again.
+    None if Redis is unavailable.
+    """
+    key = worker_config_version_key(organization_id)
+    try:
+        version = await async_redis_client.get(key)
+        if version is None:
+            await async_redis_client.set(key, time.time_ns(), nx=True)
+            version = await async_redis_client.get(key)
+        return version
+    except Exception as e:
+        print(f"Worker config version unavailable: {e}")
+        return None
+
+async def notify_worker_config_changed(organization_id: int, zone_id: Optional[int] = None):
+    """
+    Bumps the organization's config version and tells workers (and replicas) to re-fetch.
+    Best effort: workers still pick the change up on their next full refresh if this fails.
+    """
+    key = worker_config_version_key(organization_id)
+    try:
+        async with async_redis_client.pipeline(transaction=True) as pipe:
+            pipe.set(key, time.time_ns(), nx=True)
+            pipe.incr(key)
+            pipe.publish(WORKER_CONFIG_CHANNEL, json.dumps({"organization_id": organization_id, "zone_id": zone_id}))
+            await pipe.execute()
+    except Exception as e:
+        print(f"Could not notify workers of config change: {e}")
@@ -0,0 +1,69 @@
+from typing import Optional
+from app.core.config import settings
+from app.redis_client import async_redis_client
+
+# Redis layout shared with ai-worker/worker.py:
+#   spot:{id}:status      latest status (free, occupied, reserved); a 'reserved' status set
+#                         here expires with the marker, so spots no camera reports free up again
+#   spot:{id}:reserved    reservation marker, expires after SPOT_RESERVATION_TTL_SECONDS
+#   zone:{id}:free_spots  set of free spot ids per zone
+#   org:{id}:free_spots   set of free spot ids per organization
+#   spot_zone             hash spot id -> zone id
+SPOT_ZONE_HASH = "spot_zone"
+
+def zone_free_key(zone_id: int) -> str:
+    return f"zone:{zone_id}:free_spots"
+
+def org_free_key(organization_id: int) -> str:
+    return f"org:{organization_id}:free_spots"
+
+# Pops any free spot from KEYS[1] and marks it reserved, all in one atomic step.
+# KEYS: [pop_set, org_set, spot_zone_hash]  ARGV: [reservation_ttl]
+POP_FREE_SPOT_LUA = """
+local spot_id = redis.call('SPOP', KEYS[1])
+if not spot_id then
+    return false
+end
+redis.call('SREM', KEYS[2], spot_id)
+local zone_id = redis.call('HGET', KEYS[3], spot_id)
+if zone_id then
+    redis.call('SREM', 'zone:' .. zone_id .. ':free_spots', spot_id)
+end
+redis.call('SET', 'spot:' .. spot_id .. ':status', 'reserved', 'EX', ARGV[1])
+redis.call('SET', 'spot:' .. spot_id .. ':reserved', '1', 'EX', ARGV[1])
+return spot_id
+"""
+
+# Reserves one specific spot if it is free (or has no real-time status yet). A 'reserved'
+# status whose marker has expired is a lapsed reservation and counts as free.
+# KEYS: [status_key, reserved_key, zone_set, org_set]  ARGV: [spot_id, reservation_ttl]
+RESERVE_SPOT_LUA = """
+local status = redis.call('GET', KEYS[1])
+if (status and status ~= 'free' and status ~= 'reserved') or redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('SET', KEYS[1], 'reserved', 'EX', ARGV[2])
+redis.call('SET', KEYS[2], '1', 'EX', ARGV[2])
+redis.call('SREM', KEYS[3], ARGV[1])
+redis.call('SREM', KEYS[4], ARGV[1])
+return 1
+"""
+
+pop_free_spot_script = async_redis_client.register_script(POP_FREE_SPOT_LUA)
+reserve_spot_script = async_redis_client.register_script(RESERVE_SPOT_LUA)
+
+async def pop_free_spot(organization_id: int, zone_id: Optional[int] = None) -> Optional[int]:
+    """Atomically takes a free spot of the org (or of one zone) and reserves it."""
+    pop_key = zone_free_key(zone_id) if zone_id is not None else org_free_key(organization_id)
+    spot_id = await pop_free_spot_script(
+        keys=[pop_key, org_free_key(organization_id), SPOT_ZONE_HASH],
+        args=[settings.SPOT_RESERVATION_TTL_SECONDS],
+    )
+    return int(spot_id) if spot_id is not None else None
+
+async def reserve_spot(spot_id: int, zone_id: int, organization_id: int) -> bool:
+    """Atomically reserves a specific spot; False if it is taken or already reserved."""
+    return bool(await reserve_spot_script(
+        keys=[f"spot:{spot_id}:status", f"spot:{spot_id}:reserved", zone_free_key(zone_id), org_free_key(organization_id)],
+        args=[spot_id, settings.SPOT_RESERVATION_TTL_SECONDS],
+    ))
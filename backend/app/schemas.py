@@ -5,6 +5,13 @@ from .schemas_entities import *
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
+class ServiceTokenCreate(BaseModel):
+    expires_days: Optional[int] = None
 
 class TokenPayload(BaseModel):
     sub: Optional[int] = None
@@ -17,6 +17,20 @@ class CameraRead(CameraBase):
     class Config:
         orm_mode = True
 
+class WorkerCamera(BaseModel):
+    id: int
+    rtsp_url: str
+    type: str
+    zone_id: Optional[int] = None
+    organization_id: int
+    # Spot geometry of the camera's zone, one [id, x1, y1, x2, y2] row per spot
+    spots: List[List[int]] = []
+
+class WorkerConfigPage(BaseModel):
+    cameras: List[WorkerCamera]
+    # Pass as ?after= for the next page; None on the last page
+    next_after: Optional[int] = None
+
 class SpotBase(BaseModel):
     name: str
     x1: int
@@ -50,6 +64,11 @@ class ZoneBase(BaseModel):
 class ZoneCreate(ZoneBase):
     pass
 
+class ZoneUpdate(BaseModel):
+    name: Optional[str] = None
+    total_spots: Optional[int] = None
+    map_grid_data: Optional[str] = None
+
 class ZoneRead(ZoneBase):
     id: int
     organization_id: int
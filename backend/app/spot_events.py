@@ -0,0 +1,100 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple
+from redis.exceptions import ResponseError
+from app.redis_client import async_redis_client, SPOT_EVENTS_STREAM
+
+# (entry_id, fields) as returned by XREADGROUP
+Entry = Tuple[str, dict]
+EntryHandler = Callable[[List[Entry]], Awaitable[None]]
+
+READ_COUNT = 500
+BLOCK_MS = 5000
+# Entries delivered to a consumer that has been silent this long are taken over (dead replica)
+CLAIM_MIN_IDLE_MS = 60000
+CLAIM_INTERVAL_SECONDS = 30
+
+async def ensure_group(group: str):
+    try:
+        await async_redis_client.xgroup_create(SPOT_EVENTS_STREAM, group, id="$", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+async def consume_spot_events(
+    group: str,
+    consumer: str,
+    handler: EntryHandler,
+    claim_abandoned: bool = False,
+    on_reconnect: Optional[Callable[[], None]] = None,
+):
+    """
+    Reads the spot event stream through a consumer group, forever.
+    On (re)start the consumer first replays its own delivered-but-unacknowledged entries,
+    then reads new ones. The handler is responsible for XACK-ing what it has processed.
+    With claim_abandoned, entries stuck with other (dead) consumers of a shared group
+    are periodically claimed too (never the consumer's own, which its handler still holds). on_reconnect is called after a failed read, before
+    reading again (e.g. to drop state that may have missed entries).
+    """
+    while True:
+        try:
+            await ensure_group(group)
+            last_id = "0"  # our pending entries first
+            last_claim = 0.0
+            while True:
+                if claim_abandoned and time.monotonic() - last_claim > CLAIM_INTERVAL_SECONDS:
+                    last_claim = time.monotonic()
+                    claimed = await claim_from_other_consumers(group, consumer)
+                    if claimed:
+                        await handler(claimed)
+
+                response = await async_redis_client.xreadgroup(
+                    group, consumer, {SPOT_EVENTS_STREAM: last_id},
+                    count=READ_COUNT, block=BLOCK_MS if last_id == ">" else None,
+                )
+                entries = response[0][1] if response else []
+                if last_id != ">":
+                    if not entries:
+                        last_id = ">"  # caught up on pending; switch to new entries
+                        continue
+                    last_id = entries[-1][0]
+                if entries:
+                    await handler(entries)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Spot event consumer '{group}' failed: {e}. Retrying...")
+            await asyncio.sleep(1)
+            if on_reconnect is not None:
+                on_reconnect()
+
+async def claim_from_other_consumers(group: str, consumer: str) -> List[Entry]:
+    """
+    Claims the entries other consumers have left pending for CLAIM_MIN_IDLE_MS. Our own
+    idle entries are skipped: they are still held by our handler (e.g. waiting for the
+    database), and handing them over again would process them twice.
+    """
+    claimed = []
+    start = "-"
+    while True:
+        pending = await async_redis_client.xpending_range(
+            SPOT_EVENTS_STREAM, group, min=start, max="+", count=READ_COUNT, idle=CLAIM_MIN_IDLE_MS
+        )
+        entry_ids = [entry["message_id"] for entry in pending if entry["consumer"] != consumer]
+        if entry_ids:
+            # Entries trimmed from the stream meanwhile are not returned
+            claimed += await async_redis_client.xclaim(
+                SPOT_EVENTS_STREAM, group, consumer, CLAIM_MIN_IDLE_MS, entry_ids
+            )
+        if len(pending) < READ_COUNT:
+            return claimed
+        start = f"({pending[-1]['message_id']}"
+
+async def ack(group: str, entry_ids: List[str]):
+    if entry_ids:
+        await async_redis_client.xack(SPOT_EVENTS_STREAM, group, *entry_ids)
+
+def entry_time(entry_id: str) -> datetime:
+    """The (UTC) time at which Redis appended the entry, from its millisecond id."""
+    return datetime.fromtimestamp(int(entry_id.split("-")[0]) / 1000, timezone.utc)
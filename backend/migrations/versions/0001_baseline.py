@@ -0,0 +1,82 @@
+"""Baseline schema, as SQLModel.metadata.create_all created it before occupancy history existed
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "organization",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("plan_tier", sa.String(), nullable=False),
+        sa.Column("config_settings", sa.String(), nullable=True),
+    )
+    op.create_index("ix_organization_name", "organization", ["name"])
+
+    op.create_table(
+        "user",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("role", sa.String(), nullable=False),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organization.id"), nullable=True),
+    )
+    op.create_index("ix_user_email", "user", ["email"], unique=True)
+
+    op.create_table(
+        "zone",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("total_spots", sa.Integer(), nullable=False),
+        sa.Column("map_grid_data", sa.String(), nullable=True),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organization.id"), nullable=False),
+    )
+
+    op.create_table(
+        "spot",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("x1", sa.Integer(), nullable=False),
+        sa.Column("y1", sa.Integer(), nullable=False),
+        sa.Column("x2", sa.Integer(), nullable=False),
+        sa.Column("y2", sa.Integer(), nullable=False),
+        sa.Column("zone_id", sa.Integer(), sa.ForeignKey("zone.id"), nullable=False),
+    )
+
+    op.create_table(
+        "log",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("license_plate", sa.String(), nullable=False),
+        sa.Column("entry_time", sa.DateTime(), nullable=False),
+        sa.Column("exit_time", sa.DateTime(), nullable=True),
+        sa.Column("image_url", sa.String(), nullable=True),
+        sa.Column("spot_id", sa.Integer(), sa.ForeignKey("spot.id"), nullable=True),
+    )
+    op.create_index("ix_log_license_plate", "log", ["license_plate"])
+
+    op.create_table(
+        "camera",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("rtsp_url", sa.String(), nullable=False),
+        sa.Column("type", sa.String(), nullable=False),
+        sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organization.id"), nullable=False),
+        sa.Column("zone_id", sa.Integer(), sa.ForeignKey("zone.id"), nullable=True),
+    )
+
+
+def downgrade():
+    for table in ("camera", "log", "spot", "zone", "user", "organization"):
+        op.drop_table(table)
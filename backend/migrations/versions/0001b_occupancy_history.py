@@ -0,0 +1,50 @@
+"""Occupancy event history and hourly rollups
+
+Revision ID: 0001b
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001b"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by create_all after these models existed (stamped at the baseline)
+    # already have the tables
+    existing = sa.inspect(op.get_bind()).get_table_names()
+
+    if "occupancy_event" not in existing:
+        op.create_table(
+            "occupancy_event",
+            sa.Column("spot_id", sa.Integer(), sa.ForeignKey("spot.id"), primary_key=True),
+            sa.Column("ts", sa.DateTime(timezone=True), primary_key=True),
+            sa.Column("status", sa.String(), nullable=False),
+            postgresql_partition_by="RANGE (ts)",
+        )
+        op.create_index("ix_occupancy_event_ts", "occupancy_event", ["ts"])
+
+    if "occupancy_rollup" not in existing:
+        op.create_table(
+            "occupancy_rollup",
+            sa.Column("zone_id", sa.Integer(), sa.ForeignKey("zone.id"), primary_key=True),
+            sa.Column("bucket", sa.DateTime(timezone=True), primary_key=True),
+            sa.Column("organization_id", sa.Integer(), sa.ForeignKey("organization.id"), nullable=False),
+            sa.Column("spot_count", sa.Integer(), nullable=False),
+            sa.Column("occupied_seconds", sa.Float(), nullable=False),
+            sa.Column("capacity_seconds", sa.Float(), nullable=False),
+            sa.Column("arrivals", sa.Integer(), nullable=False),
+            sa.Column("departures", sa.Integer(), nullable=False),
+            sa.Column("dwell_seconds", sa.Float(), nullable=False),
+        )
+        op.create_index("ix_occupancy_rollup_bucket", "occupancy_rollup", ["bucket"])
+        op.create_index("ix_occupancy_rollup_organization_id", "occupancy_rollup", ["organization_id"])
+
+
+def downgrade():
+    op.drop_table("occupancy_rollup")
+    op.drop_table("occupancy_event")
@@ -0,0 +1,35 @@
+"""Indexes for the per-org and per-zone lookups
+
+Revision ID: 0002
+Revises: 0001b
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Free-spot lookups and occupancy counts filter spots by zone and status
+    op.create_index("ix_spot_zone_id_status", "spot", ["zone_id", "status"])
+    # Per-org listings (ordered/paged by id) and the org's zone ids for analytics
+    op.create_index("ix_zone_organization_id_id", "zone", ["organization_id", "id"])
+    op.create_index("ix_camera_organization_id_id", "camera", ["organization_id", "id"])
+    op.create_index("ix_camera_zone_id", "camera", ["zone_id"])
+    op.create_index("ix_user_organization_id", "user", ["organization_id"])
+    # Analytics read an org's rollups over a time range
+    op.drop_index("ix_occupancy_rollup_organization_id", table_name="occupancy_rollup")
+    op.create_index("ix_occupancy_rollup_organization_id_bucket", "occupancy_rollup", ["organization_id", "bucket"])
+
+
+def downgrade():
+    op.drop_index("ix_occupancy_rollup_organization_id_bucket", table_name="occupancy_rollup")
+    op.create_index("ix_occupancy_rollup_organization_id", "occupancy_rollup", ["organization_id"])
+    op.drop_index("ix_user_organization_id", table_name="user")
+    op.drop_index("ix_camera_zone_id", table_name="camera")
+    op.drop_index("ix_camera_organization_id_id", table_name="camera")
+    op.drop_index("ix_zone_organization_id_id", table_name="zone")
+    op.drop_index("ix_spot_zone_id_status", table_name="spot")
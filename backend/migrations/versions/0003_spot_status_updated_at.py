@@ -0,0 +1,22 @@
+"""Time of the spot event behind each persisted spot status
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Replicas flush independently, so an older event must not overwrite a newer status
+    op.add_column("spot", sa.Column("status_updated_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column("spot", "status_updated_at")
@@ -0,0 +1,22 @@
+"""Version counter of each zone's grid layout
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The route cache checks this instead of loading and hashing map_grid_data per request
+    op.add_column("zone", sa.Column("grid_version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    op.drop_column("zone", "grid_version")
@@ -0,0 +1,88 @@
+"""
+Requests/sec of an authenticated endpoint (GET /api/v1/cameras/) with the principal
+cache enabled and disabled (every request then loads the user, as before).
+
+Runs the ASGI app in-process against a scratch SQLite database (or --database-url),
+so it measures the app and database path, not the network.
+
+    cd backend && python -m scripts.benchmark_auth --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+async def run(client, path: str, headers: dict, total: int, concurrency: int) -> float:
+    """Issues total requests from concurrency tasks; returns requests/sec."""
+    remaining = [total]
+
+    async def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+async def benchmark(args):
+    import httpx
+    from sqlmodel import Session
+    from app.core import security
+    from app.core.config import settings
+    from app.core.principal_cache import principal_cache
+    from app.database import engine, init_db
+    from app.main import app
+    from app.models import Camera, Organization, User
+
+    init_db()
+    with Session(engine) as session:
+        org = Organization(name="auth-benchmark")
+        session.add(org)
+        session.flush()
+        user = User(email=f"auth-benchmark-{time.time()}@example.com", hashed_password="-", organization_id=org.id)
+        session.add(user)
+        for c in range(10):
+            session.add(Camera(name=f"C{c}", rtsp_url="rtsp://auth-benchmark/stream", organization_id=org.id))
+        session.commit()
+        token = security.create_access_token(user.id, claims={"org": user.organization_id, "role": user.role})
+    headers = {"Authorization": f"Bearer {token}"}
+    path = f"{settings.API_V1_STR}/cameras/"
+
+    # No lifespan: only the request path is measured
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        await run(client, path, headers, args.concurrency, args.concurrency)  # warm up pools
+        results = {}
+        for label, ttl in (("without cache", 0), ("with cache", settings.PRINCIPAL_CACHE_TTL_SECONDS or 60.0)):
+            principal_cache.clear()
+            principal_cache.ttl = ttl
+            results[label] = await run(client, path, headers, args.requests, args.concurrency)
+
+    for label, rate in results.items():
+        print(f"{label:14} {rate:9.0f} req/s")
+    print(f"{'speedup':14} {results['with cache'] / results['without cache']:9.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--database-url", help="defaults to a scratch SQLite file")
+    args = parser.parse_args()
+
+    # The app reads its settings at import time
+    scratch = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}"
+    try:
+        asyncio.run(benchmark(args))
+    finally:
+        if scratch is not None:
+            os.unlink(scratch.name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Times the hot Spot/Camera/Zone lookups against DATABASE_URL with and without
+the indexes added in migration 0002.
+
+Seeds a large synthetic tenant (plus same-sized neighbour tenants, so per-org
+filters have something to filter out), runs each query with the indexes dropped
+and again with them in place, and prints median/p95 timings (and on PostgreSQL
+the top plan node). Everything happens in one transaction that is rolled back,
+so the database is left untouched.
+
+    cd backend && python -m scripts.benchmark_queries --zones 100 --spots-per-zone 200
+"""
+import argparse
+import random
+import statistics
+import time
+from sqlalchemy import func, insert, text
+from sqlmodel import Session, select
+from app.database import engine, init_db
+from app.models import Camera, Organization, Spot, Zone
+from app.api.v1.endpoints.analytics import occupancy_query
+
+# The indexes from migration 0002 that these queries are meant to use
+HOT_INDEXES = {
+    Spot.__table__: ["ix_spot_zone_id_status"],
+    Zone.__table__: ["ix_zone_organization_id_id"],
+    Camera.__table__: ["ix_camera_organization_id_id", "ix_camera_zone_id"],
+}
+
+def seed(connection, tenants: int, zones: int, spots_per_zone: int) -> int:
+    """Inserts the tenants; returns the id of the first (benchmarked) organization."""
+    organization_ids = []
+    for n in range(tenants):
+        organization_ids.append(connection.execute(
+            insert(Organization.__table__).values(name=f"benchmark-tenant-{n}", plan_tier="enterprise")
+        ).inserted_primary_key[0])
+
+    for organization_id in organization_ids:
+        connection.execute(insert(Zone.__table__), [
+            {"name": f"Z{z}", "total_spots": spots_per_zone, "organization_id": organization_id}
+            for z in range(zones)
+        ])
+        zone_ids = connection.execute(
+            select(Zone.id).where(Zone.organization_id == organization_id)
+        ).scalars().all()
+        connection.execute(insert(Camera.__table__), [
+            {"name": f"C{zone_id}", "rtsp_url": "rtsp://benchmark/stream", "type": "parking",
+             "organization_id": organization_id, "zone_id": zone_id}
+            for zone_id in zone_ids
+        ])
+        for zone_id in zone_ids:
+            connection.execute(insert(Spot.__table__), [
+                {"name": f"S{s}", "status": "occupied" if random.random() < 0.6 else "free",
+                 "x1": 0, "y1": 0, "x2": 1, "y2": 1, "zone_id": zone_id}
+                for s in range(spots_per_zone)
+            ])
+    return organization_ids[0]
+
+def analyze(connection):
+    connection.execute(text("ANALYZE"))
+
+def plan_root(connection, statement) -> str:
+    if engine.dialect.name != "postgresql":
+        return ""
+    sql = statement.compile(engine, compile_kwargs={"literal_binds": True})
+    return connection.execute(text(f"EXPLAIN {sql}")).scalars().first().split("  (")[0].strip()
+
+def time_queries(connection, queries, repeat: int) -> dict:
+    results = {}
+    with Session(bind=connection) as session:
+        for name, statement in queries:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                session.exec(statement).all()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = (
+                statistics.median(timings),
+                timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+                plan_root(connection, statement),
+            )
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=10, help="organizations to seed, the first is benchmarked")
+    parser.add_argument("--zones", type=int, default=100, help="zones per organization")
+    parser.add_argument("--spots-per-zone", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20, help="runs per query")
+    args = parser.parse_args()
+
+    init_db()
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            started = time.perf_counter()
+            organization_id = seed(connection, args.tenants, args.zones, args.spots_per_zone)
+            print(f"Seeded {args.tenants} tenants x {args.zones} zones x {args.spots_per_zone} spots "
+                  f"in {time.perf_counter() - started:.1f}s")
+            zone_id = connection.execute(
+                select(func.min(Zone.id)).where(Zone.organization_id == organization_id)
+            ).scalar_one()
+
+            queries = [
+                ("analytics occupancy (grouped)", occupancy_query(organization_id)),
+                ("zones of org (first page)", select(Zone).where(Zone.organization_id == organization_id).order_by(Zone.id).limit(100)),
+                ("cameras of org (first page)", select(Camera).where(Camera.organization_id == organization_id).order_by(Camera.id).limit(100)),
+                ("camera of zone", select(Camera).where(Camera.zone_id == zone_id)),
+                ("free spots of zone", select(Spot.id).where(Spot.zone_id == zone_id, Spot.status == "free")),
+                ("occupied count of zone", select(func.count(Spot.id)).where(Spot.zone_id == zone_id, Spot.status == "occupied")),
+            ]
+
+            indexes = [index for table, names in HOT_INDEXES.items() for index in table.indexes if index.name in names]
+            for index in indexes:
+                index.drop(connection)
+            analyze(connection)
+            before = time_queries(connection, queries, args.repeat)
+            for index in indexes:
+                index.create(connection)
+            analyze(connection)
+            after = time_queries(connection, queries, args.repeat)
+        finally:
+            transaction.rollback()
+
+    print(f"\n{'query':34} {'before p50/p95 ms':>20} {'after p50/p95 ms':>20} {'speedup':>8}")
+    for name, _ in queries:
+        b50, b95, b_plan = before[name]
+        a50, a95, a_plan = after[name]
+        print(f"{name:34} {b50:9.2f} /{b95:9.2f} {a50:9.2f} /{a95:9.2f} {b50 / a50 if a50 else 0:7.1f}x")
+        if b_plan or a_plan:
+            print(f"{'':34} {b_plan} -> {a_plan}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Counts the SQL statements each hot endpoint issues and checks that the count does
+not grow with the number of zones and spots (no N+1 lazy loading).
+
+Seeds one tenant per size into a scratch SQLite database (or --database-url),
+calls every endpoint through the ASGI app and prints the statements per request.
+Exits non-zero if any endpoint's count differs between sizes. Redis must be
+reachable at REDIS_URL, as for the app itself.
+
+    cd backend && python -m scripts.check_query_counts --sizes 1x2 5x10 25x40
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ENDPOINTS = [
+    ("GET", "/api/v1/zones/"),
+    ("GET", "/api/v1/zones/{zone_id}"),
+    ("GET", "/api/v1/cameras/"),
+    ("GET", "/api/v1/cameras/worker-config"),
+    ("GET", "/api/v1/analytics/occupancy"),
+    ("POST", "/api/v1/navigation/assign-nearest"),
+    ("POST", "/api/v1/navigation/assign"),
+]
+
+def parse_size(value: str):
+    zones, spots = value.lower().split("x")
+    return int(zones), int(spots)
+
+def seed_tenant(engine, zones: int, spots_per_zone: int):
+    """One organization with an admin, zones x spots and a camera per zone; returns (user id, first zone id)."""
+    from sqlmodel import Session
+    from app.models import Camera, Organization, Spot, User, Zone
+
+    grid = [[4] + [0] * spots_per_zone, [1] + [2] * spots_per_zone]
+    with Session(engine) as session:
+        org = Organization(name=f"query-count-{zones}x{spots_per_zone}")
+        session.add(org)
+        session.flush()
+        user = User(email=f"query-count-{zones}x{spots_per_zone}@example.com", hashed_password="-", organization_id=org.id)
+        session.add(user)
+        zone_ids = []
+        for z in range(zones):
+            zone = Zone(name=f"Z{z}", total_spots=spots_per_zone, map_grid_data=json.dumps(grid), organization_id=org.id)
+            session.add(zone)
+            session.flush()
+            zone_ids.append(zone.id)
+            session.add(Camera(name=f"C{z}", rtsp_url="rtsp://query-count/stream", organization_id=org.id, zone_id=zone.id))
+            for s in range(spots_per_zone):
+                session.add(Spot(name=f"S{s}", x1=s + 1, y1=1, x2=s + 1, y2=1, zone_id=zone.id))
+        session.commit()
+        return user.id, zone_ids[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # At least two spots: assign-nearest takes one before assign runs
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[(1, 2), (5, 10), (25, 40)],
+                        help="ZONESxSPOTS_PER_ZONE tenants to compare")
+    parser.add_argument("--database-url", help="defaults to a scratch SQLite file")
+    args = parser.parse_args()
+
+    # The app reads its settings at import time
+    scratch = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        os.environ["DATABASE_URL"] = f"sqlite:///{scratch.name}"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from app.core import security
+    from app.database import async_engine, engine, init_db
+    from app.main import app
+
+    statements = []
+    event.listen(async_engine.sync_engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+
+    init_db()
+    # Without the context manager the lifespan (stream consumers, writers) is not started
+    client = TestClient(app)
+    counts = {}
+    try:
+        for size in args.sizes:
+            user_id, zone_id = seed_tenant(engine, *size)
+            headers = {"Authorization": f"Bearer {security.create_access_token(user_id)}"}
+            for method, path in ENDPOINTS:
+                statements.clear()
+                response = client.request(method, path.format(zone_id=zone_id), headers=headers)
+                if response.status_code >= 400:
+                    print(f"{method} {path} failed for {size}: {response.status_code} {response.text}")
+                counts[(method, path, size)] = len(statements)
+    finally:
+        if scratch is not None:
+            os.unlink(scratch.name)
+
+    header = "".join(f"{f'{z}x{s}':>10}" for z, s in args.sizes)
+    print(f"{'endpoint':44}{header}")
+    growing = []
+    for method, path in ENDPOINTS:
+        row = [counts[(method, path, size)] for size in args.sizes]
+        print(f"{method + ' ' + path:44}" + "".join(f"{count:>10}" for count in row))
+        if len(set(row)) > 1:
+            growing.append(f"{method} {path}")
+    if growing:
+        print(f"\nStatement count depends on tenant size: {', '.join(growing)}")
+        sys.exit(1)
+    print("\nStatement counts are constant.")
+
+if __name__ == "__main__":
+    main()
@@ -213,7 +213,8 @@ export default function AdminDashboard() {
     // ── WebSocket ────────────────────────────────────────────────
     useEffect(() => {
         const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
-        const wsUrl = `${protocol}://${window.location.host}/ws/spots`;
+        const token = localStorage.getItem('token');
+        const wsUrl = `${protocol}://${window.location.host}/ws/spots?token=${encodeURIComponent(token || '')}`;
 
         function connect() {
             const ws = new WebSocket(wsUrl);
@@ -227,18 +228,22 @@ export default function AdminDashboard() {
             ws.onmessage = (event) => {
                 try {
                     const data = JSON.parse(event.data);
-                    if (data.spot_id && data.status) {
+                    // The AI worker batches a tick's changes as { updates: [...] }
+                    const updates = (data.updates || [data]).filter(u => u.spot_id && u.status);
+                    if (updates.length > 0) {
+                        const statusById = new Map(updates.map(u => [u.spot_id, u.status]));
                         // Update spot status in state
                         setSpots(prev => prev.map(s =>
-                            s.id === data.spot_id ? { ...s, status: data.status } : s
+                            statusById.has(s.id) ? { ...s, status: statusById.get(s.id) } : s
                         ));
                         // Add to feed
-                        setFeedEvents(prev => [{
-                            id: Date.now(),
-                            spotId: data.spot_id,
-                            status: data.status,
+                        const now = Date.now();
+                        setFeedEvents(prev => [...updates.map((u, i) => ({
+                            id: `${now}-${i}`,
+                            spotId: u.spot_id,
+                            status: u.status,
                             time: new Date().toLocaleTimeString(),
-                        }, ...prev].slice(0, 20));
+                        })), ...prev].slice(0, 20));
                         // Refresh occupancy
                         fetchOccupancy();
                     }